@@ -0,0 +1,241 @@
+"""HTTP API только для чтения: справочник сотрудников
+
+    GET /employees                   список; фильтры и сортировка как в show_employees:
+                                     position, level, salary_min, salary_max,
+                                     sort, order, limit, cursor
+    GET /employees/search?q=петров   поиск по ФИО (q, limit, cursor)
+    GET /employees/<id>              один сотрудник
+    GET /employees/<id>/subtree      сотрудник и подчиненные (depth, limit)
+    GET /positions                   должности
+
+Список отдается keyset-страницами: в ответе поле next - непрозрачный
+курсор следующей страницы (ключ page_key последней строки), который
+передается параметром cursor. Соединения берутся из db_pool, страницы -
+через get_employees_page с кэшем результатов.
+
+ETag ответа - версии таблиц positions и employees (table_versions в БД,
+см. cache.sync_table_versions): пока данные не менялись, запрос с
+If-None-Match получает 304 без тела и без запросов к данным. Без
+table_versions (её создает generate_employees_data) об изменениях из
+других процессов узнать нельзя: ответы идут без ETag, страницы списка
+читаются мимо кэша результатов.
+
+    python api.py --port 8080
+"""
+import argparse
+import base64
+import json
+import re
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from cache import get_positions, sync_table_versions
+from db_pool import PoolTimeout, connection
+from employees import (PAGE_SIZE, SORT_FIELDS, get_employee, get_employees_page, normalize_filters,
+                       normalize_sort, page_key)
+from export import EXPORT_COLUMNS, json_default
+from hierarchy import MAX_DEPTH, get_subtree
+from search import search_employees, search_key
+
+MAX_LIMIT = 1000
+SUBTREE_COLUMNS = ["id", "depth", "first_name", "last_name", "position", "level", "salary",
+                   "manager_id"]
+
+
+class NotFound(Exception):
+    pass
+
+
+def encode_cursor(key):
+    data = json.dumps(key, default=json_default).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(token, sort_field):
+    """Ключ page_key из курсора; ValueError при неверном курсоре"""
+    try:
+        value, employee_id = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if sort_field == "hire_date":
+            value = date.fromisoformat(value)
+        elif sort_field in ("id", "salary"):
+            value = int(value)
+        elif sort_field == "rank":
+            value = float(value)
+        elif not isinstance(value, str):
+            raise TypeError(sort_field)
+        return value, int(employee_id)
+    except (ValueError, TypeError):
+        raise ValueError("неверный cursor")
+
+
+def _param(query, name, default=None):
+    values = query.get(name)
+    return values[-1] if values else default
+
+
+def _int_param(query, name, default, maximum=None):
+    value = _param(query, name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"{name} должен быть целым числом")
+    if value < 1:
+        raise ValueError(f"{name} должен быть больше 0")
+    return min(value, maximum) if maximum else value
+
+
+def list_employees(conn, query, use_cache=True):
+    filters = normalize_filters(_param(query, "position"), _param(query, "level"),
+                                _param(query, "salary_min"), _param(query, "salary_max"))
+    sort_field = _param(query, "sort", "id")
+    if sort_field not in SORT_FIELDS:
+        raise ValueError(f"sort должен быть одним из: {', '.join(SORT_FIELDS)}")
+    sort_field, sort_order = normalize_sort(sort_field, _param(query, "order", "ASC"))
+    limit = _int_param(query, "limit", PAGE_SIZE, MAX_LIMIT)
+    token = _param(query, "cursor")
+    after = decode_cursor(token, sort_field) if token else None
+
+    rows = get_employees_page(conn, filters, sort_field, sort_order, limit, after=after,
+                              use_cache=use_cache)
+    return {
+        "items": [dict(zip(EXPORT_COLUMNS, row)) for row in rows],
+        "next": encode_cursor(page_key(rows[-1], sort_field)) if len(rows) == limit else None,
+    }
+
+
+def find_employees(conn, query, use_cache=True):
+    limit = _int_param(query, "limit", PAGE_SIZE, MAX_LIMIT)
+    token = _param(query, "cursor")
+    after = decode_cursor(token, "rank") if token else None
+    with conn.cursor() as cursor:
+        rows = search_employees(cursor, _param(query, "q", ""), limit, after)
+    return {
+        "items": [dict(zip(EXPORT_COLUMNS + ["rank"], row)) for row in rows],
+        "next": encode_cursor(search_key(rows[-1])) if len(rows) == limit else None,
+    }
+
+
+def show_employee(conn, query, employee_id, use_cache=True):
+    with conn.cursor() as cursor:
+        row = get_employee(cursor, int(employee_id))
+    if row is None:
+        raise NotFound(f"сотрудник {employee_id} не найден")
+    return dict(zip(EXPORT_COLUMNS, row))
+
+
+def show_subtree(conn, query, employee_id, use_cache=True):
+    depth = _int_param(query, "depth", MAX_DEPTH, MAX_DEPTH)
+    limit = _int_param(query, "limit", PAGE_SIZE, MAX_LIMIT)
+    with conn.cursor() as cursor:
+        rows = get_subtree(cursor, int(employee_id), depth, limit)
+    if not rows:
+        raise NotFound(f"сотрудник {employee_id} не найден")
+    return {"items": [dict(zip(SUBTREE_COLUMNS, row)) for row in rows]}
+
+
+def list_positions(conn, query, use_cache=True):
+    with conn.cursor() as cursor:
+        positions = get_positions(cursor)
+    return {"items": [{"id": position_id, "title": title, "level": level}
+                      for position_id, (title, level) in positions.items()]}
+
+
+ROUTES = [
+    (re.compile(r"^/employees/?$"), list_employees),
+    (re.compile(r"^/employees/search/?$"), find_employees),
+    (re.compile(r"^/employees/(\d+)/?$"), show_employee),
+    (re.compile(r"^/employees/(\d+)/subtree/?$"), show_subtree),
+    (re.compile(r"^/positions/?$"), list_positions),
+]
+
+
+def current_etag(conn):
+    """ETag по версиям таблиц из table_versions или None, если её нет"""
+    with conn.cursor() as cursor:
+        versions = sync_table_versions(cursor)
+    if not versions:
+        return None
+    return f'"{versions.get("positions", 0)}.{versions.get("employees", 0)}"'
+
+
+class EmployeeAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Заголовки и тело пишутся отдельно: без TCP_NODELAY keep-alive
+    # ответы ждут задержанного ACK (~40 мс)
+    disable_nagle_algorithm = True
+    quiet = False
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        for pattern, handler in ROUTES:
+            match = pattern.match(url.path)
+            if match:
+                break
+        else:
+            return self._send(404, {"error": "не найдено"})
+
+        try:
+            with connection() as conn:
+                etag = current_etag(conn)
+                if etag and etag in self.headers.get("If-None-Match", ""):
+                    return self._send(304, None, etag)
+                payload = handler(conn, parse_qs(url.query), *match.groups(),
+                                  use_cache=etag is not None)
+        except ValueError as e:
+            return self._send(400, {"error": str(e)})
+        except NotFound as e:
+            return self._send(404, {"error": str(e)})
+        except PoolTimeout as e:
+            return self._send(503, {"error": str(e)})
+        except Exception as e:
+            return self._send(500, {"error": str(e)})
+        self._send(200, payload, etag)
+
+    def _send(self, status, payload, etag=None):
+        body = b"" if payload is None else json.dumps(
+            payload, ensure_ascii=False, default=json_default).encode()
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if payload is not None:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(host="127.0.0.1", port=8080, quiet=False):
+    handler = type("Handler", (EmployeeAPIHandler,), {"quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP API справочника сотрудников")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--quiet", action="store_true", help="не писать журнал запросов")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.quiet)
+    print(f"✅ API слушает http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
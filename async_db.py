@@ -0,0 +1,162 @@
+"""Асинхронный доступ к данным (psycopg 3 + psycopg_pool)
+
+Повторяет основные запросы синхронных модулей - список сотрудников с
+фильтрами и keyset-пагинацией, должности, добавление сотрудника и
+запросы иерархии - поверх AsyncConnectionPool. Тексты SQL берутся из
+employees.py и hierarchy.py, так что оба слоя выполняют одни и те же
+запросы. Пока запрос ждет ответа БД, цикл событий обслуживает другие:
+один процесс держит сотни одновременных запросов при max_size
+соединений в пуле.
+
+    async with async_pool():
+        rows = await fetch_employees_page(level_filter="Junior", limit=50)
+
+Нужны пакеты psycopg и psycopg_pool (pip install "psycopg[binary]" psycopg_pool).
+"""
+from contextlib import asynccontextmanager
+
+from psycopg_pool import AsyncConnectionPool
+
+import config
+from cache import bump_table_version, positions_cache
+from employees import (EMPLOYEE_FIELDS, PAGE_SIZE, build_filters, build_employees_query,
+                       normalize_filters, validate_employee)
+from hierarchy import (MAX_DEPTH, SUBTREE_SQL, CHAIN_SQL, ROLLUP_SQL, CLOSURE_EXISTS_SQL,
+                       CLOSURE_SELF_SQL, CLOSURE_ANCESTORS_SQL)
+
+_pool = None
+
+
+async def init_async_pool(min_size=None, max_size=None):
+    """Создает и открывает пул (размеры по умолчанию - DB_POOL_MIN/DB_POOL_MAX)"""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+    _pool = AsyncConnectionPool(
+        kwargs=config.connect_kwargs(),
+        min_size=config.DB_POOL_MIN if min_size is None else min_size,
+        max_size=config.DB_POOL_MAX if max_size is None else max_size,
+        timeout=config.DB_POOL_TIMEOUT,
+        open=False,
+    )
+    await _pool.open()
+    return _pool
+
+
+async def close_async_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+@asynccontextmanager
+async def async_pool(min_size=None, max_size=None):
+    """Открывает пул на время блока"""
+    pool = await init_async_pool(min_size, max_size)
+    try:
+        yield pool
+    finally:
+        await close_async_pool()
+
+
+def get_async_pool():
+    if _pool is None:
+        raise RuntimeError("пул не создан: вызовите init_async_pool()")
+    return _pool
+
+
+async def _fetchall(sql, params=()):
+    async with get_async_pool().connection() as conn:
+        cursor = await conn.execute(sql, params)
+        return await cursor.fetchall()
+
+
+async def fetch_employees_page(position_filter=None, level_filter=None, salary_min=None,
+                               salary_max=None, sort_field="id", sort_order="ASC",
+                               limit=PAGE_SIZE, after=None, before=None):
+    """Страница сотрудников (строки EMPLOYEES_SELECT), как employees.list_employees"""
+    filters = normalize_filters(position_filter, level_filter, salary_min, salary_max)
+    conditions, params = build_filters(*filters)
+    sql, params = build_employees_query(conditions, params, sort_field, sort_order,
+                                        limit=limit, after=after, before=before)
+    rows = await _fetchall(sql, params)
+    if before is not None:
+        rows.reverse()
+    return rows
+
+
+async def get_positions():
+    """Словарь {id: (title, level)}; общий кэш с cache.get_positions"""
+    positions = positions_cache.get("all")
+    if positions is None:
+        rows = await _fetchall("SELECT id, title, level FROM positions ORDER BY id")
+        positions = {row[0]: (row[1], row[2]) for row in rows}
+        positions_cache.set("all", positions)
+    return positions
+
+
+async def create_employee(first_name, last_name, position_id, hire_date, salary,
+                          middle_name=None, manager_id=None):
+    """Добавляет сотрудника с проверками employees.validate_employee
+
+    Возвращает id; при ошибке проверки - ValueError.
+    """
+    row = dict(first_name=first_name, last_name=last_name, middle_name=middle_name,
+               position_id=position_id, hire_date=hire_date, salary=salary,
+               manager_id=manager_id)
+    positions = await get_positions()
+
+    async with get_async_pool().connection() as conn:
+        manager_ids = set()
+        if manager_id not in (None, ""):
+            try:
+                cursor = await conn.execute("SELECT id FROM employees WHERE id = %s",
+                                            (int(manager_id),))
+                manager_ids = {employee_id for (employee_id,) in await cursor.fetchall()}
+            except ValueError:
+                pass
+
+        values, error = validate_employee(row, positions, manager_ids)
+        if error:
+            raise ValueError(error)
+
+        # Блок connection() фиксирует транзакцию при выходе без исключения
+        cursor = await conn.execute(f"""
+            INSERT INTO employees ({', '.join(EMPLOYEE_FIELDS)})
+            VALUES ({', '.join(['%s'] * len(EMPLOYEE_FIELDS))})
+            RETURNING id, manager_id
+        """, values)
+        employee_id, manager_id = await cursor.fetchone()
+
+        cursor = await conn.execute(CLOSURE_EXISTS_SQL)
+        if (await cursor.fetchone())[0]:
+            await conn.execute(CLOSURE_SELF_SQL, (employee_id, employee_id))
+            if manager_id is not None:
+                await conn.execute(CLOSURE_ANCESTORS_SQL, (employee_id, manager_id))
+
+    bump_table_version("employees")
+    return employee_id
+
+
+async def get_subtree(employee_id, max_depth=MAX_DEPTH, limit=None):
+    """Сотрудник и все его подчиненные, как hierarchy.get_subtree"""
+    sql = SUBTREE_SQL
+    params = [employee_id, max_depth]
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return await _fetchall(sql, params)
+
+
+async def get_chain_of_command(employee_id, max_depth=MAX_DEPTH):
+    return await _fetchall(CHAIN_SQL, (employee_id, max_depth))
+
+
+async def get_headcount_rollup(max_depth=MAX_DEPTH, limit=None):
+    sql = ROLLUP_SQL
+    params = [max_depth]
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return await _fetchall(sql, params)
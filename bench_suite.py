@@ -0,0 +1,325 @@
+"""Воспроизводимый набор бенчмарков с результатами в JSON
+
+Для каждого объема данных (по умолчанию 10k, 100k и 1M рядовых
+сотрудников) набор генерирует данные с фиксированным seed и измеряет:
+
+- generation - generate_employees_data, строк/с;
+- listing    - формы запросов show_employees: без фильтров, с фильтрами,
+               по каждому полю сортировки, вторая страница, подсчет;
+- hierarchy  - поддерево, цепочка руководителей, сводка по руководителям
+               и (если построена) проверки по таблице замыкания;
+- search     - поиск по ФИО: частый короткий префикс, префикс с именем,
+               опечатка и следующая страница;
+- inserts    - create_employee по одному и add_employees пакетами.
+
+Для запросов - задержки p50/p95/p99 и строк/с. Кэш результатов
+отключен, чтобы измерялась БД, а не память процесса. Результаты
+пишутся в JSON; compare сравнивает два файла и показывает изменения:
+
+    python bench_suite.py run --sizes 10000 100000 --output before.json
+    python bench_suite.py run --sizes 10000 100000 --output after.json
+    python bench_suite.py compare before.json after.json
+
+С --partition position|hire_date данные генерируются в секционированную
+таблицу - так сравнивается обычная схема с секционированной.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime
+
+from tabulate import tabulate
+
+from benchmark import percentile
+from db_pool import connection
+from employees import (PAGE_SIZE, SORT_FIELDS, add_employees, create_employee, get_employee_count,
+                       get_employees_page, normalize_filters, page_key)
+from hierarchy import (closure_exists, get_chain_of_command, get_depth, get_headcount_rollup,
+                       get_subtree, is_subordinate)
+from main import generate_employees_data
+from partitions import PARTITION_SCHEMES
+from search import search_employees, search_key
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+
+# Формы запросов списка: (название, фильтры для normalize_filters, поле, порядок)
+LISTING_SHAPES = [
+    ("unfiltered", (None, None, None, None), "id", "ASC"),
+    ("filter_position_salary", ("Разработчик", None, 60000, 70000), "id", "ASC"),
+    ("filter_level", (None, "Junior", None, None), "salary", "DESC"),
+    ("filter_salary_min", (None, None, 110000, None), "salary", "DESC"),
+] + [(f"sort_{field}", (None, None, None, None), field, "ASC") for field in SORT_FIELDS]
+
+# Формы поиска: (название, запрос). Короткий частый префикс совпадает с
+# большой долей таблицы - на нем видно ограничение кандидатов
+SEARCH_SHAPES = [
+    ("prefix_short", "ива"),
+    ("prefix_name", "иванов пет"),
+    ("typo", "петрв"),
+]
+# Группы запросов в результатах
+QUERY_GROUPS = ("listing", "hierarchy", "search", "inserts")
+
+
+def latency_stats(latencies, rows=0):
+    """Сводка по задержкам (секунды): p50/p95/p99 в мс и строк/с"""
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "runs": len(latencies),
+        "mean_ms": total / len(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rows_per_s": rows / total if total else 0.0,
+    }
+
+
+def timed(func, repeat):
+    """Выполняет func() repeat раз; func возвращает число строк"""
+    latencies = []
+    rows = 0
+    for i in range(repeat):
+        started = time.perf_counter()
+        result = func(i)
+        latencies.append(time.perf_counter() - started)
+        rows += result or 0
+    return latency_stats(latencies, rows)
+
+
+def bench_generation(size, seed, workers, closure, partitioning=None):
+    started = time.perf_counter()
+    generate_employees_data(size, seed=seed, workers=workers, build_closure=closure,
+                            partitioning=partitioning)
+    elapsed = time.perf_counter() - started
+    with connection() as conn:
+        total, _ = get_employee_count(conn, exact=True, use_cache=False)
+    return {"rows": total, "seconds": elapsed, "rows_per_s": total / elapsed if elapsed else 0.0}
+
+
+def bench_listing(conn, repeat):
+    results = {}
+    for name, filters, sort_field, sort_order in LISTING_SHAPES:
+        filters = normalize_filters(*filters)
+
+        def first_page(_):
+            return len(get_employees_page(conn, filters, sort_field, sort_order, use_cache=False))
+        results[name] = timed(first_page, repeat)
+
+        # Вторая страница - keyset от последней строки первой
+        rows = get_employees_page(conn, filters, sort_field, sort_order, use_cache=False)
+        if len(rows) == PAGE_SIZE:
+            after = page_key(rows[-1], sort_field)
+
+            def next_page(_):
+                return len(get_employees_page(conn, filters, sort_field, sort_order,
+                                              after=after, use_cache=False))
+            results[name + "_page2"] = timed(next_page, repeat)
+
+    def count(_):
+        get_employee_count(conn, normalize_filters(None, "Junior"), exact=True, use_cache=False)
+        return 1
+    results["count_filtered"] = timed(count, repeat)
+    conn.rollback()
+    return results
+
+
+def bench_hierarchy(conn, repeat, rng):
+    cursor = conn.cursor()
+    cursor.execute("SELECT array_agg(DISTINCT manager_id) FROM employees WHERE manager_id IS NOT NULL")
+    managers = cursor.fetchone()[0] or [1]
+    cursor.execute("SELECT MAX(id) FROM employees")
+    max_id = cursor.fetchone()[0] or 1
+    sample_managers = [rng.choice(managers) for _ in range(repeat)]
+    sample_employees = [rng.randint(1, max_id) for _ in range(repeat)]
+
+    results = {
+        "subtree_depth2": timed(
+            lambda i: len(get_subtree(cursor, sample_managers[i], max_depth=2, limit=1000)), repeat),
+        "chain_of_command": timed(
+            lambda i: len(get_chain_of_command(cursor, sample_employees[i])), repeat),
+        # Обход всей организации - мало повторов
+        "headcount_rollup": timed(
+            lambda i: len(get_headcount_rollup(cursor, limit=20)), max(1, repeat // 10)),
+    }
+    if closure_exists(cursor):
+        results["closure_is_subordinate"] = timed(
+            lambda i: int(is_subordinate(cursor, sample_employees[i], sample_managers[i])), repeat)
+        results["closure_depth"] = timed(lambda i: int(get_depth(cursor, sample_employees[i]) is not None),
+                                         repeat)
+    conn.rollback()
+    return results
+
+
+def bench_search(conn, repeat):
+    cursor = conn.cursor()
+    results = {}
+    for name, query in SEARCH_SHAPES:
+        results[name] = timed(lambda i: len(search_employees(cursor, query, PAGE_SIZE)), repeat)
+        rows = search_employees(cursor, query, PAGE_SIZE)
+        if len(rows) == PAGE_SIZE:
+            after = search_key(rows[-1])
+            results[name + "_page2"] = timed(
+                lambda i: len(search_employees(cursor, query, PAGE_SIZE, after=after)), repeat)
+    conn.rollback()
+    return results
+
+
+def _new_employee(rng, managers):
+    return dict(first_name="Бенчмарк", last_name=f"Сотрудник{rng.randint(1, 10 ** 6)}",
+                position_id=rng.choice((6, 7, 8, 9)), hire_date="2023-01-15",
+                salary=rng.randint(40000, 80000), manager_id=rng.choice(managers))
+
+
+def bench_inserts(conn, repeat, batch_size, rng):
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM employees WHERE position_id IN (3, 4) ORDER BY id LIMIT 1000")
+    managers = [row[0] for row in cursor.fetchall()] or [None]
+    conn.rollback()
+
+    return {
+        "create_employee": timed(lambda i: int(bool(create_employee(conn, **_new_employee(rng, managers)))),
+                                 repeat),
+        f"add_employees_{batch_size}": timed(
+            lambda i: len(add_employees(conn, [_new_employee(rng, managers)
+                                               for _ in range(batch_size)])["inserted"]),
+            max(1, repeat // 10)),
+    }
+
+
+def environment():
+    """Описание окружения для сравнения результатов"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SHOW server_version")
+        server_version = cursor.fetchone()[0]
+        conn.rollback()
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "postgres": server_version,
+    }
+
+
+def run_suite(sizes=DEFAULT_SIZES, repeat=50, batch_size=1000, seed=42, workers=1, closure=True,
+              partitioning=None):
+    """Выполняет набор на каждом объеме данных и возвращает результаты"""
+    report = {"environment": environment(),
+              "settings": {"sizes": list(sizes), "repeat": repeat, "batch_size": batch_size,
+                           "seed": seed, "workers": workers, "closure": closure,
+                           "partitioning": partitioning},
+              "runs": []}
+    for size in sizes:
+        print(f"\n=== {size} сотрудников ===")
+        rng = random.Random(seed)
+        generation = bench_generation(size, seed, workers, closure, partitioning)
+        run = {"size": size, "generation": generation}
+        with connection() as conn:
+            run["listing"] = bench_listing(conn, repeat)
+            run["hierarchy"] = bench_hierarchy(conn, repeat, rng)
+            run["search"] = bench_search(conn, repeat)
+            # Вставки меняют данные - измеряются последними
+            run["inserts"] = bench_inserts(conn, repeat, batch_size, rng)
+        report["runs"].append(run)
+        print_run(run)
+    return report
+
+
+def print_run(run):
+    gen = run["generation"]
+    print(f"\nГенерация: {gen['rows']} строк за {gen['seconds']:.1f} с ({gen['rows_per_s']:,.0f} строк/с)")
+    rows = []
+    for group in QUERY_GROUPS:
+        for name, stats in run.get(group, {}).items():
+            rows.append((group, name, f"{stats['p50_ms']:.2f}", f"{stats['p95_ms']:.2f}",
+                         f"{stats['p99_ms']:.2f}", f"{stats['rows_per_s']:,.0f}"))
+    print(tabulate(rows, headers=["Группа", "Запрос", "p50, мс", "p95, мс", "p99, мс", "Строк/с"],
+                   tablefmt="grid"))
+
+
+def compare(before_path, after_path, threshold=0.1):
+    """Сравнивает p95 и скорость генерации двух файлов результатов
+
+    Изменения больше threshold (доля) помечаются. Возвращает число ухудшений.
+    """
+    with open(before_path, encoding="utf-8") as f:
+        before = {run["size"]: run for run in json.load(f)["runs"]}
+    with open(after_path, encoding="utf-8") as f:
+        after = {run["size"]: run for run in json.load(f)["runs"]}
+
+    rows = []
+    regressions = 0
+    for size in sorted(before.keys() & after.keys()):
+        old, new = before[size], after[size]
+        metrics = [("generation", "rows_per_s", old["generation"]["rows_per_s"],
+                    new["generation"]["rows_per_s"], True)]
+        for group in QUERY_GROUPS:
+            # В старых файлах результатов может не быть группы
+            for name in old.get(group, {}).keys() & new.get(group, {}).keys():
+                metrics.append((group, name, old[group][name]["p95_ms"], new[group][name]["p95_ms"], False))
+
+        for group, name, old_value, new_value, higher_is_better in sorted(metrics):
+            if not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            worse = -change if higher_is_better else change
+            mark = ""
+            if worse > threshold:
+                mark = "❌"
+                regressions += 1
+            elif worse < -threshold:
+                mark = "✅"
+            rows.append((size, group, name, f"{old_value:,.2f}", f"{new_value:,.2f}", f"{change:+.0%}", mark))
+
+    print(tabulate(rows, headers=["Объем", "Группа", "Метрика (p95 мс / строк/с)", "Было", "Стало",
+                                  "Изменение", ""], tablefmt="grid"))
+    print(f"Ухудшений больше {threshold:.0%}: {regressions}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Набор бенчмарков с результатами в JSON")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="сгенерировать данные и выполнить измерения")
+    run.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    run.add_argument("--repeat", type=int, default=50, help="повторов каждого запроса")
+    run.add_argument("--batch-size", type=int, default=1000, help="размер пакета add_employees")
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--workers", type=int, default=1)
+    run.add_argument("--no-closure", dest="closure", action="store_false",
+                     help="не строить таблицу замыкания")
+    run.add_argument("--partition", choices=sorted(PARTITION_SCHEMES), default=None,
+                     help="секционировать employees (см. partitions.py)")
+    run.add_argument("--output", default=None,
+                     help="файл результатов (по умолчанию bench-<дата>.json)")
+
+    diff = subparsers.add_parser("compare", help="сравнить два файла результатов")
+    diff.add_argument("before")
+    diff.add_argument("after")
+    diff.add_argument("--threshold", type=float, default=0.1)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        report = run_suite(args.sizes, args.repeat, args.batch_size, args.seed, args.workers,
+                           args.closure, args.partition)
+        output = args.output or f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ Результаты записаны в {output}")
+        return 0
+    return 1 if compare(args.before, args.after, args.threshold) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,299 @@
+"""Микро-бенчмарки генерации тестовых данных и доступа к БД
+
+Запуск:
+    python benchmark.py leaf --rows 20000 --managers 2000
+    python benchmark.py async --requests 2000 --concurrency 1 10 100
+    python benchmark.py http --requests 5000 --concurrency 1 10 50
+"""
+import argparse
+import asyncio
+import http.client
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import psycopg2
+from tabulate import tabulate
+
+import config
+from employees import PAGE_SIZE, build_filters, fetch_employees_page, normalize_filters
+from main import person, dt, generate_leaf_batch
+from name_pool import DEFAULT_POOL_SIZE, load_name_pools
+
+
+def legacy_leaf_batch(size, team_leads, managers):
+    """Прежняя построчная генерация рядовых сотрудников (для сравнения)"""
+    junior_positions = [6, 7, 8, 9]
+    middle_positions = [5, 10]
+
+    employees_batch = []
+    for _ in range(size):
+        if random.random() < 0.8:
+            position_id = random.choice(junior_positions)
+            salary = random.randint(40000, 80000)
+        else:
+            position_id = random.choice(middle_positions)
+            salary = random.randint(80000, 120000)
+
+        manager_pool = team_leads + managers
+        manager_id = random.choice(manager_pool)
+
+        employees_batch.append((
+            person.first_name(),
+            person.last_name(),
+            person.last_name() if random.random() > 0.3 else None,
+            position_id,
+            dt.date(start=2018, end=2023),
+            salary,
+            manager_id
+        ))
+    return employees_batch
+
+
+def _measure(func, rows):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    return rows / elapsed if elapsed else float("inf")
+
+
+def bench_leaf_generation(rows=20000, num_managers=2000, seed=42, name_pool_size=DEFAULT_POOL_SIZE):
+    """Сравнивает скорость генерации рядовых сотрудников, строк/с"""
+    random.seed(seed)
+    person.reseed(seed)
+    dt.reseed(seed)
+
+    managers = list(range(1, num_managers // 3 + 1))
+    team_leads = list(range(len(managers) + 1, num_managers + 1))
+    rng = random.Random(seed)
+
+    before = _measure(lambda: legacy_leaf_batch(rows, team_leads, managers), rows)
+    after = _measure(lambda: generate_leaf_batch(rows, team_leads + managers, rng), rows)
+    names = load_name_pools(seed=seed, size=name_pool_size)
+    pooled = _measure(lambda: generate_leaf_batch(rows, team_leads + managers, rng, names), rows)
+
+    print(f"Рядовые сотрудники: {rows} строк, {num_managers} менеджеров")
+    print(f"  до (построчно):        {before:,.0f} строк/с")
+    print(f"  после (пакетом):       {after:,.0f} строк/с")
+    print(f"  пакетом + пулы имен:   {pooled:,.0f} строк/с")
+    print(f"  ускорение: x{after / before:.2f}, с пулами имен x{pooled / before:.2f}")
+    return {"before": before, "after": after, "name_pools": pooled}
+
+
+def percentile(sorted_values, q):
+    """Перцентиль q (0-100) отсортированного списка, ближайший ранг"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _summary(mode, concurrency, latencies, elapsed, errors):
+    latencies.sort()
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+# Запрос бенчмарка: первая страница Junior по убыванию зарплаты
+LISTING_FILTERS = (None, "Junior", None, None)
+LISTING_SORT = ("salary", "DESC")
+
+
+def bench_sync_listing(concurrency, requests):
+    """Синхронный путь: потоки, у каждого свое соединение psycopg2.connect (как connect_to_db)"""
+    conditions, params = build_filters(*normalize_filters(*LISTING_FILTERS))
+    local = threading.local()
+    connections = []
+    errors = 0
+
+    def request(_):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            if not hasattr(local, "conn"):
+                local.conn = psycopg2.connect(**config.connect_kwargs())
+                connections.append(local.conn)
+            fetch_employees_page(local.conn, conditions, params, *LISTING_SORT, limit=PAGE_SIZE)
+            local.conn.rollback()
+        except psycopg2.Error:
+            errors += 1
+            return None
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = [t for t in executor.map(request, range(requests)) if t is not None]
+    elapsed = time.perf_counter() - started
+    for conn in connections:
+        conn.close()
+    return _summary("sync", concurrency, latencies, elapsed, errors)
+
+
+async def _async_listing(concurrency, requests, pool_size):
+    import async_db
+
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await async_db.fetch_employees_page(*LISTING_FILTERS, *LISTING_SORT, limit=PAGE_SIZE)
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    async with async_db.async_pool(min_size=min(pool_size, concurrency), max_size=pool_size):
+        started = time.perf_counter()
+        await asyncio.gather(*(request() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+    return _summary("async", concurrency, latencies, elapsed, errors)
+
+
+def bench_async_listing(concurrency, requests, pool_size):
+    """Асинхронный путь: корутины поверх AsyncConnectionPool из pool_size соединений"""
+    return asyncio.run(_async_listing(concurrency, requests, pool_size))
+
+
+def bench_concurrency(levels=(1, 10, 100), requests=2000, pool_size=None):
+    """Сравнивает sync и async выполнение списка сотрудников на разной конкурентности"""
+    pool_size = pool_size or config.DB_POOL_MAX
+    results = []
+    for concurrency in levels:
+        results.append(bench_sync_listing(concurrency, requests))
+        results.append(bench_async_listing(concurrency, requests, pool_size))
+
+    print(f"Список сотрудников: {requests} запросов, пул async - {pool_size} соединений")
+    print(tabulate(
+        [(r["mode"], r["concurrency"], f"{r['rps']:,.0f}", f"{r['p50_ms']:.1f}",
+          f"{r['p99_ms']:.1f}", r["errors"]) for r in results],
+        headers=["Режим", "Конкурентность", "Запросов/с", "p50, мс", "p99, мс", "Ошибок"],
+        tablefmt="grid"
+    ))
+    return results
+
+
+# Смесь запросов нагрузочного теста HTTP API
+HTTP_PATHS = (
+    "/employees",
+    "/employees?level=Junior&sort=salary&order=desc",
+    "/employees?position=Разработчик&salary_min=60000&limit=100",
+    "/employees?sort=hire_date&limit=20",
+    "/employees/2",
+    "/employees/2/subtree?depth=1",
+    "/positions",
+)
+
+
+def bench_http(base_url=None, levels=(1, 10, 50), requests=5000, etag=False):
+    """Нагрузочный тест api.py: запросов/с, p50 и p99 на каждой конкурентности
+
+    Без base_url сервер запускается в этом же процессе на свободном порту.
+    С etag=True клиенты повторяют запросы с If-None-Match (ответы 304).
+    """
+    from urllib.parse import quote
+
+    server = None
+    if base_url is None:
+        import api
+        server = api.make_server(port=0, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    url = urlsplit(base_url)
+    paths = [quote(path, safe="/?&=") for path in HTTP_PATHS]
+
+    results = []
+    try:
+        for concurrency in levels:
+            local = threading.local()
+            errors = 0
+
+            def request(i):
+                nonlocal errors
+                if not hasattr(local, "conn"):
+                    local.conn = http.client.HTTPConnection(url.hostname, url.port)
+                    local.etags = {}
+                path = paths[i % len(paths)]
+                headers = {"If-None-Match": local.etags[path]} if etag and path in local.etags else {}
+                started = time.perf_counter()
+                try:
+                    local.conn.request("GET", path, headers=headers)
+                    response = local.conn.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    local.conn.close()
+                    errors += 1
+                    return None
+                if response.status not in (200, 304):
+                    errors += 1
+                if response.getheader("ETag"):
+                    local.etags[path] = response.getheader("ETag")
+                return time.perf_counter() - started
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as executor:
+                latencies = [t for t in executor.map(request, range(requests)) if t is not None]
+            elapsed = time.perf_counter() - started
+            results.append(_summary("http+etag" if etag else "http", concurrency, latencies,
+                                    elapsed, errors))
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    print(f"HTTP API {base_url}: {requests} запросов на уровень, {len(paths)} видов запросов")
+    print(tabulate(
+        [(r["mode"], r["concurrency"], f"{r['rps']:,.0f}", f"{r['p50_ms']:.1f}",
+          f"{r['p99_ms']:.1f}", r["errors"]) for r in results],
+        headers=["Режим", "Конкурентность", "Запросов/с", "p50, мс", "p99, мс", "Ошибок"],
+        tablefmt="grid"
+    ))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки генерации данных и доступа к БД")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    leaf = subparsers.add_parser("leaf", help="генерация рядовых сотрудников")
+    leaf.add_argument("--rows", type=int, default=20000)
+    leaf.add_argument("--managers", type=int, default=2000)
+    leaf.add_argument("--seed", type=int, default=42)
+    leaf.add_argument("--name-pool-size", type=int, default=DEFAULT_POOL_SIZE)
+
+    concurrency = subparsers.add_parser("async", help="sync и async список сотрудников")
+    concurrency.add_argument("--requests", type=int, default=2000)
+    concurrency.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    concurrency.add_argument("--pool-size", type=int, default=None,
+                             help="размер async-пула (по умолчанию DB_POOL_MAX)")
+
+    load = subparsers.add_parser("http", help="нагрузочный тест HTTP API (api.py)")
+    load.add_argument("--url", default=None, help="адрес запущенного API; по умолчанию - свой сервер")
+    load.add_argument("--requests", type=int, default=5000)
+    load.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    load.add_argument("--etag", action="store_true", help="повторные запросы с If-None-Match")
+
+    args = parser.parse_args()
+    if args.command == "leaf":
+        bench_leaf_generation(args.rows, args.managers, args.seed, args.name_pool_size)
+    elif args.command == "async":
+        bench_concurrency(args.concurrency, args.requests, args.pool_size)
+    elif args.command == "http":
+        bench_http(args.url, args.concurrency, args.requests, args.etag)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Кэш справочных данных для списков сотрудников
+
+- должности (таблица positions из 10 строк) - целиком, с временем жизни;
+- отображаемые имена руководителей по id - LRU с временем жизни.
+
+С прогретым кэшем список сотрудников читается из employees без
+соединения с positions и без self-join для имени руководителя
+(см. employees.fetch_employees_page). Записи в employees сбрасывают
+соответствующие элементы кэша: add_employee - имя добавленного
+сотрудника, generate_employees_data - всё.
+
+Кроме того, кэшируются готовые страницы списка (employees.get_employees_page).
+Ключ включает версию таблицы employees: запись лишь увеличивает счетчик
+версии (bump_table_version), а страницы со старой версией становятся
+недостижимыми и вытесняются по LRU.
+
+Счетчики версий живут в процессе. Если в БД есть таблица table_versions
+(её обновляют триггеры, см. main.create_version_triggers), процессы,
+которые только читают - например, HTTP API - вызывают
+sync_table_versions() и так узнают о записях из других процессов.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+
+class TTLCache:
+    """LRU-кэш с временем жизни записей и счетчиками попаданий"""
+
+    def __init__(self, name, maxsize, ttl):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires = item
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Удаляет одну запись или (key=None) весь кэш"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            size = len(self._data)
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+positions_cache = TTLCache("positions", 1, config.POSITIONS_CACHE_TTL)
+manager_names_cache = TTLCache("manager_names", config.MANAGER_CACHE_SIZE, config.MANAGER_CACHE_TTL)
+results_cache = TTLCache("employee_pages", config.RESULT_CACHE_SIZE, config.RESULT_CACHE_TTL)
+
+_versions_lock = threading.Lock()
+_table_versions = {"employees": 0, "positions": 0}
+
+
+def table_version(table):
+    return _table_versions[table]
+
+
+def bump_table_version(*tables):
+    """Отмечает запись в таблицы; кэшированные результаты по ним устаревают"""
+    with _versions_lock:
+        for table in tables:
+            _table_versions[table] += 1
+
+
+# Последние версии, прочитанные из table_versions
+_db_versions = {}
+
+
+def sync_table_versions(cursor):
+    """Сверяет локальные версии с table_versions в БД
+
+    Если таблица изменилась в другом процессе, локальная версия
+    увеличивается, а связанный кэш справочников сбрасывается.
+    Возвращает {таблица: версия в БД} или {}, если table_versions нет.
+    """
+    cursor.execute("SELECT to_regclass('table_versions') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        return {}
+    cursor.execute("SELECT name, version FROM table_versions")
+    versions = dict(cursor.fetchall())
+
+    changed = []
+    with _versions_lock:
+        for table, version in versions.items():
+            if table in _table_versions and _db_versions.get(table) != version:
+                if table in _db_versions:
+                    changed.append(table)
+                _db_versions[table] = version
+    if "positions" in changed:
+        positions_cache.invalidate()
+    if "employees" in changed:
+        manager_names_cache.invalidate()
+    if changed:
+        bump_table_version(*changed)
+    return versions
+
+
+_MISSING = object()
+
+
+def get_positions(cursor):
+    """Словарь {id: (title, level)} всех должностей"""
+    positions = positions_cache.get("all")
+    if positions is None:
+        cursor.execute("SELECT id, title, level FROM positions ORDER BY id")
+        positions = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+        positions_cache.set("all", positions)
+    return positions
+
+
+def get_manager_names(cursor, manager_ids):
+    """Словарь {id: "Имя Фамилия"}; недостающие имена читаются одним запросом"""
+    names = {}
+    missing = []
+    for manager_id in set(manager_ids):
+        if manager_id is None:
+            continue
+        name = manager_names_cache.get(manager_id, _MISSING)
+        if name is _MISSING:
+            missing.append(manager_id)
+        else:
+            names[manager_id] = name
+
+    if missing:
+        cursor.execute("""
+            SELECT id, first_name || ' ' || last_name
+            FROM employees
+            WHERE id = ANY(%s)
+        """, (missing,))
+        for manager_id, name in cursor.fetchall():
+            names[manager_id] = name
+            manager_names_cache.set(manager_id, name)
+
+    return names
+
+
+def invalidate_employee(employee_id):
+    """Сбрасывает кэшированное имя сотрудника и результаты списков"""
+    manager_names_cache.invalidate(employee_id)
+    bump_table_version("employees")
+
+
+def invalidate_all():
+    """Сбрасывает весь кэш (после пересоздания таблиц)"""
+    positions_cache.invalidate()
+    manager_names_cache.invalidate()
+    results_cache.invalidate()
+    bump_table_version("employees", "positions")
+
+
+def cache_stats():
+    return [positions_cache.stats(), manager_names_cache.stats(), results_cache.stats()]
+
+
+def print_cache_stats():
+    print("\nКэш:")
+    for stats in cache_stats():
+        print(f"{stats['name']}: записей {stats['size']}, попаданий {stats['hits']}, "
+              f"промахов {stats['misses']} ({stats['hit_rate']:.0%} попаданий), "
+              f"вытеснено {stats['evictions']}")
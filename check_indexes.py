@@ -0,0 +1,221 @@
+"""Проверка планов основных запросов через EXPLAIN
+
+Для каждого вида запроса из show_employees проверяет, что планировщик
+использует предназначенный для него индекс, а для секционированной
+таблицы employees (см. partitions.py) - что фильтры отсекают лишние
+секции. Проверять стоит на объеме, близком к рабочему:
+
+    python check_indexes.py --rows 1000000   # сгенерировать 1M и проверить
+    python check_indexes.py --rows 5000000 --partition position
+    python check_indexes.py                  # проверить текущие данные
+"""
+import argparse
+import json
+from datetime import date
+
+from tabulate import tabulate
+
+from cache import get_positions
+from db_pool import get_connection, release_connection
+from employees import PAGE_SIZE, build_filters, build_employees_query, page_select
+from partitions import (DEFAULT_PARTITION, PARTITION_SCHEMES, hire_years, partition_name,
+                        partition_scheme)
+from search import NAME_EXPR, SEARCH_INDEX, SEARCH_PREFIX_INDEX
+
+
+def query_shapes(scheme=None, positions=None):
+    """Виды запросов: (название, sql, params, ожидаемый индекс)
+
+    Запросы списка собираются так же, как в fetch_employees_page: с
+    positions (cache.get_positions) фильтры должности и уровня - это
+    e.position_id = ANY(...), а SELECT - без соединений.
+    """
+    shapes = []
+    # В секциях по должности фильтр должности - это выбор секций, а
+    # диапазон зарплаты обслуживает (salary, id)
+    position_salary_index = "employees_position_id_salary_idx"
+    if scheme == "position":
+        position_salary_index = "employees_salary_id_idx"
+
+    def listing(name, index, sort_field="id", sort_order="ASC", after=None, **filters):
+        conditions, params = build_filters(positions=positions, **filters)
+        sql, params = build_employees_query(conditions, params, sort_field, sort_order,
+                                            limit=PAGE_SIZE, after=after,
+                                            select=page_select(sort_field, positions))
+        shapes.append((name, sql, params, index))
+
+    listing("Без фильтров, по id", "employees_pkey")
+    listing("Без фильтров, по id, страница 100", "employees_pkey", after=(5000, 5000))
+    listing("Сортировка по зарплате", "employees_salary_id_idx", "salary", "DESC")
+    listing("Следующая страница по зарплате", "employees_salary_id_idx", "salary", "DESC",
+            after=(100000, 1000))
+    listing("Сортировка по дате приема", "employees_hire_date_id_idx", "hire_date")
+    listing("Сортировка по фамилии", "employees_last_name_id_idx", "last_name")
+    listing("Сортировка по имени", "employees_first_name_id_idx", "first_name")
+    listing("Должность + диапазон зарплаты", position_salary_index,
+            position_filter="Дизайнер", salary_min=70000, salary_max=75000)
+    listing("Уровень + минимальная зарплата", position_salary_index,
+            level_filter="Middle", salary_min=115000)
+
+    shapes.append((
+        "Подчиненные руководителя",
+        "SELECT id, first_name, last_name FROM employees WHERE manager_id = %s",
+        [2],
+        "employees_manager_id_idx",
+    ))
+    shapes.append((
+        "Поиск по ФИО",
+        f"SELECT id FROM employees e WHERE {NAME_EXPR.format(t='e.')} LIKE %s",
+        ["%иванов%"],
+        SEARCH_INDEX,
+    ))
+    shapes.append((
+        "Поиск по началу ФИО",
+        f"SELECT id FROM employees e WHERE {NAME_EXPR.format(t='e.')} COLLATE \"C\" LIKE %s "
+        f"ORDER BY {NAME_EXPR.format(t='e.')} COLLATE \"C\" LIMIT 1000",
+        ["ива%"],
+        SEARCH_PREFIX_INDEX,
+    ))
+    shapes.append((
+        "Должность по названию",
+        "SELECT id FROM positions WHERE title = %s",
+        ["Разработчик"],
+        "positions_title_key",
+    ))
+    return shapes
+
+
+def partition_shapes(scheme, positions):
+    """Запросы, отсекающие секции: (название, sql, params, допустимые секции)"""
+    shapes = []
+
+    def listing(name, partitions, sort_field="id", sort_order="ASC", after=None, **filters):
+        conditions, params = build_filters(positions=positions, **filters)
+        sql, params = build_employees_query(conditions, params, sort_field, sort_order,
+                                            limit=PAGE_SIZE, after=after,
+                                            select=page_select(sort_field, positions))
+        shapes.append((name, sql, params, set(partitions)))
+
+    if scheme == "position":
+        for level in ("Middle", "Junior"):
+            listing(f"Секции: уровень {level}",
+                    [partition_name(scheme, position_id)
+                     for position_id, (_, position_level) in positions.items()
+                     if position_level == level],
+                    level_filter=level)
+        listing("Секции: должность + зарплата",
+                [partition_name(scheme, position_id)
+                 for position_id, (title, _) in positions.items() if title == "Дизайнер"],
+                "salary", "DESC", position_filter="Дизайнер", salary_min=70000)
+    elif scheme == "hire_date":
+        listing("Секции: страница по дате приема с 2022 года",
+                [f"employees_y{year}" for year in hire_years() if year >= 2022] + [DEFAULT_PARTITION],
+                "hire_date", after=(date(2022, 6, 1), 1000))
+        listing("Секции: страница по дате приема до 2015 года",
+                [f"employees_y{year}" for year in hire_years() if year <= 2015] + [DEFAULT_PARTITION],
+                "hire_date", "DESC", after=(date(2015, 6, 1), 1000))
+    return shapes
+
+
+def scanned_partitions(plan):
+    """Секции employees, которые читает основная выборка (псевдоним e)
+
+    Соединение с руководителем (m, в SELECT с соединениями) читает все секции - его не считаем.
+    """
+    partitions = set()
+    alias = plan.get("Alias", "")
+    if plan.get("Relation Name", "").startswith("employees") and (alias == "e" or alias.startswith("e_")):
+        partitions.add(plan["Relation Name"])
+    for child in plan.get("Plans", ()):
+        partitions |= scanned_partitions(child)
+    return partitions
+
+
+def parent_indexes(cursor, names):
+    """Заменяет индексы секций индексами родительской таблицы"""
+    cursor.execute("""
+        SELECT c.relname, p.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE c.relname = ANY(%s)
+    """, (list(names),))
+    parents = dict(cursor.fetchall())
+    return {parents.get(name, name) for name in names}
+
+
+def used_indexes(plan):
+    """Собирает имена индексов из всех узлов плана EXPLAIN (FORMAT JSON)"""
+    indexes = set()
+    if "Index Name" in plan:
+        indexes.add(plan["Index Name"])
+    for child in plan.get("Plans", ()):
+        indexes |= used_indexes(child)
+    return indexes
+
+
+def check_query_plans(conn):
+    """Возвращает [(название, ожидаемый индекс, использованные индексы, ok)]"""
+    results = []
+    with conn.cursor() as cursor:
+        scheme = partition_scheme(cursor)
+        positions = get_positions(cursor)
+        for name, sql, params, expected in query_shapes(scheme, positions):
+            indexes = used_indexes(explain(cursor, sql, params))
+            if scheme:
+                indexes = parent_indexes(cursor, indexes)
+            results.append((name, expected, ", ".join(sorted(indexes)) or "-", expected in indexes))
+
+        if scheme:
+            for name, sql, params, allowed in partition_shapes(scheme, positions):
+                scanned = scanned_partitions(explain(cursor, sql, params))
+                results.append((name, ", ".join(sorted(allowed)), ", ".join(sorted(scanned)) or "-",
+                                bool(scanned) and scanned <= allowed))
+    return results
+
+
+def explain(cursor, sql, params):
+    """Корневой узел плана EXPLAIN (FORMAT JSON)"""
+    cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка использования индексов")
+    parser.add_argument("--rows", type=int, default=None,
+                        help="перед проверкой сгенерировать указанное число сотрудников")
+    parser.add_argument("--partition", choices=sorted(PARTITION_SCHEMES), default=None,
+                        help="генерировать секционированную таблицу (с --rows)")
+    args = parser.parse_args()
+
+    if args.rows:
+        from main import generate_employees_data
+        generate_employees_data(args.rows, partitioning=args.partition)
+
+    conn = get_connection()
+    if not conn:
+        return 1
+
+    try:
+        results = check_query_plans(conn)
+    finally:
+        release_connection(conn)
+
+    print(tabulate(
+        [(name, expected, used, "✅" if ok else "❌") for name, expected, used, ok in results],
+        headers=["Запрос", "Ожидаемый индекс / секции", "Использованы", ""],
+        tablefmt="grid"
+    ))
+    failed = sum(1 for *_, ok in results if not ok)
+    if failed:
+        print(f"❌ Запросов без ожидаемого индекса: {failed}")
+        return 1
+    print("✅ Все запросы используют ожидаемые индексы")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
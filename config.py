@@ -0,0 +1,45 @@
+"""Настройки подключения к БД
+
+Значения читаются из переменных окружения и файла .env (см. README).
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Данные для подключения
+DB_NAME = os.getenv("DB_NAME", "test")
+DB_USER = os.getenv("DB_USER", "postgres")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "12345678")
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = int(os.getenv("DB_PORT", "5432"))
+
+# Пул соединений
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+
+# Кэш справочных данных (см. cache.py)
+POSITIONS_CACHE_TTL = float(os.getenv("POSITIONS_CACHE_TTL", "300"))
+MANAGER_CACHE_TTL = float(os.getenv("MANAGER_CACHE_TTL", "300"))
+MANAGER_CACHE_SIZE = int(os.getenv("MANAGER_CACHE_SIZE", "10000"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "60"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1000"))
+
+# Учет SQL-запросов (см. instrumentation.py)
+SQL_STATS = os.getenv("SQL_STATS", "1") != "0"
+SQL_LOG_FILE = os.getenv("SQL_LOG_FILE", "")
+SQL_EXPLAIN_THRESHOLD_MS = float(os.getenv("SQL_EXPLAIN_THRESHOLD_MS", "0"))
+
+
+def connect_kwargs():
+    """Параметры для psycopg2.connect()"""
+    return {
+        "dbname": DB_NAME,
+        "user": DB_USER,
+        "password": DB_PASSWORD,
+        "host": DB_HOST,
+        "port": DB_PORT,
+    }
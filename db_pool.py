@@ -0,0 +1,197 @@
+"""Общий пул соединений с PostgreSQL
+
+Функции работы с сотрудниками берут соединение из пула вместо того,
+чтобы открывать новое на каждый вызов:
+
+    conn = get_connection()
+    try:
+        ...
+    finally:
+        release_connection(conn)
+
+или
+
+    with connection() as conn:
+        ...
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions, pool as pg_pool
+
+import config
+from instrumentation import InstrumentedCursor
+
+_pool = None
+_pool_lock = threading.RLock()
+# Ограничивает число выданных соединений: ThreadedConnectionPool при
+# исчерпании сразу бросает PoolError, а нам нужно ждать освобождения
+_slots = None
+_last_used = {}
+_health_check_interval = config.DB_POOL_HEALTH_CHECK_INTERVAL
+
+_stats_lock = threading.Lock()
+_stats = {
+    "checkouts": 0,
+    "wait_total": 0.0,
+    "wait_max": 0.0,
+    "timeouts": 0,
+    "health_check_failures": 0,
+    "discarded": 0,
+}
+
+
+class PoolTimeout(Exception):
+    """Не удалось получить соединение из пула за отведенное время"""
+
+
+def init_pool(minconn=None, maxconn=None, health_check_interval=None, **connect_kwargs):
+    """Создает пул соединений (повторный вызов пересоздает его)"""
+    global _pool, _slots, _health_check_interval
+
+    minconn = config.DB_POOL_MIN if minconn is None else minconn
+    maxconn = config.DB_POOL_MAX if maxconn is None else maxconn
+    _health_check_interval = (config.DB_POOL_HEALTH_CHECK_INTERVAL
+                              if health_check_interval is None else health_check_interval)
+    kwargs = config.connect_kwargs()
+    if config.SQL_STATS:
+        kwargs["cursor_factory"] = InstrumentedCursor
+    kwargs.update(connect_kwargs)
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+        _pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **kwargs)
+        _slots = threading.BoundedSemaphore(maxconn)
+        _last_used.clear()
+    print(f"✅ Пул соединений создан ({minconn}-{maxconn})")
+    return _pool
+
+
+def get_pool():
+    with _pool_lock:
+        if _pool is None:
+            init_pool()
+        return _pool
+
+
+def _is_healthy(conn):
+    """Проверяет соединение, простаивавшее дольше интервала проверки"""
+    if conn.closed:
+        return False
+    last_used = _last_used.get(id(conn))
+    if last_used is None or time.monotonic() - last_used < _health_check_interval:
+        return True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _checkout(timeout):
+    pool = get_pool()
+    started = time.perf_counter()
+    if not _slots.acquire(timeout=timeout):
+        with _stats_lock:
+            _stats["timeouts"] += 1
+        raise PoolTimeout(f"нет свободных соединений за {timeout} с")
+    wait = time.perf_counter() - started
+
+    try:
+        conn = pool.getconn()
+        if not _is_healthy(conn):
+            with _stats_lock:
+                _stats["health_check_failures"] += 1
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+    except Exception:
+        _slots.release()
+        raise
+
+    with _stats_lock:
+        _stats["checkouts"] += 1
+        _stats["wait_total"] += wait
+        _stats["wait_max"] = max(_stats["wait_max"], wait)
+    return conn
+
+
+def get_connection(timeout=None):
+    """Берет соединение из пула; при ошибке печатает её и возвращает None"""
+    try:
+        return _checkout(config.DB_POOL_TIMEOUT if timeout is None else timeout)
+    except Exception as e:
+        print(f"❌ Ошибка подключения: {e}")
+        return None
+
+
+def release_connection(conn, discard=False):
+    """Возвращает соединение в пул, откатывая незавершенную транзакцию"""
+    if conn is None:
+        return
+
+    if not conn.closed and not discard:
+        try:
+            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            discard = True
+
+    discard = discard or bool(conn.closed)
+    if discard:
+        with _stats_lock:
+            _stats["discarded"] += 1
+        _last_used.pop(id(conn), None)
+    else:
+        _last_used[id(conn)] = time.monotonic()
+
+    try:
+        get_pool().putconn(conn, close=discard)
+    finally:
+        _slots.release()
+
+
+@contextmanager
+def connection(timeout=None):
+    """Контекстный менеджер: соединение из пула, возвращаемое по выходу"""
+    conn = _checkout(config.DB_POOL_TIMEOUT if timeout is None else timeout)
+    try:
+        yield conn
+    finally:
+        release_connection(conn)
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _last_used.clear()
+
+
+def pool_stats():
+    """Счетчики пула: выдачи, ожидание соединения, сбои проверок"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["wait_avg"] = stats["wait_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+    if _pool is not None:
+        stats["in_use"] = len(_pool._used)
+        stats["idle"] = len(_pool._pool)
+    return stats
+
+
+def print_pool_stats():
+    stats = pool_stats()
+    print("\nПул соединений:")
+    print(f"Выдано соединений: {stats['checkouts']}")
+    print(f"Ожидание соединения: среднее {stats['wait_avg'] * 1000:.2f} мс, "
+          f"максимум {stats['wait_max'] * 1000:.2f} мс")
+    print(f"Таймауты: {stats['timeouts']}, неудачные проверки: {stats['health_check_failures']}, "
+          f"закрыто: {stats['discarded']}")
+    if "in_use" in stats:
+        print(f"Занято: {stats['in_use']}, свободно: {stats['idle']}")
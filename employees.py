@@ -0,0 +1,633 @@
+"""Запросы к списку сотрудников
+
+Постраничный вывод использует keyset-пагинацию: следующая страница
+начинается после пары (значение поля сортировки, id) последней строки
+предыдущей страницы, поэтому в Python никогда не читается больше одной
+страницы.
+
+iter_employees() - генератор поверх серверного курсора для выгрузки
+любого числа строк при постоянном расходе памяти.
+
+get_employees_page() - страница по фильтрам с кэшем результатов
+(cache.results_cache) и подготовленными операторами на каждую форму запроса.
+
+list_employees() и create_employee() - API без ввода-вывода для скриптов.
+
+add_employees() - массовое добавление с проверкой всех записей до вставки.
+"""
+import hashlib
+import itertools
+import threading
+import weakref
+from datetime import date
+
+import psycopg2.extras
+
+from cache import (get_manager_names, get_positions, results_cache, table_version,
+                   bump_table_version)
+from hierarchy import closure_exists, add_many_to_closure
+
+EMPLOYEES_SELECT = """
+    SELECT e.id, e.first_name, e.last_name, e.middle_name,
+           p.title as position, p.level, e.hire_date, e.salary,
+           m.first_name || ' ' || m.last_name as manager
+    FROM employees e
+    LEFT JOIN positions p ON e.position_id = p.id
+    LEFT JOIN employees m ON e.manager_id = m.id
+"""
+
+# Список без соединений: должность и имя руководителя берутся из кэша
+EMPLOYEES_SELECT_BARE = """
+    SELECT e.id, e.first_name, e.last_name, e.middle_name,
+           e.position_id, e.hire_date, e.salary, e.manager_id
+    FROM employees e
+"""
+
+EMPLOYEE_HEADERS = ["ID", "Имя", "Фамилия", "Отчество", "Должность", "Уровень", "Дата приема", "Зарплата",
+                    "Менеджер"]
+
+# Поле сортировки -> (выражение SQL, индекс столбца в EMPLOYEES_SELECT)
+SORT_FIELDS = {
+    "id": ("e.id", 0),
+    "first_name": ("e.first_name", 1),
+    "last_name": ("e.last_name", 2),
+    "position": ("COALESCE(p.title, '')", 4),
+    "level": ("COALESCE(p.level, '')", 5),
+    "hire_date": ("e.hire_date", 6),
+    "salary": ("e.salary", 7),
+}
+
+PAGE_SIZE = 50
+# Размер порции при потоковом чтении через серверный курсор
+ITERSIZE = 2000
+
+_cursor_ids = itertools.count(1)
+
+
+def build_filters(position_filter=None, level_filter=None, salary_min=None, salary_max=None,
+                  positions=None):
+    """Возвращает условия WHERE и параметры для фильтров списка сотрудников
+
+    Если передан словарь должностей {id: (title, level)} (cache.get_positions),
+    фильтры по должности и уровню превращаются в e.position_id = ANY(...)
+    и запрос обходится без соединения с positions.
+    """
+    conditions = []
+    params = []
+
+    if positions is not None and (position_filter or level_filter):
+        conditions.append("e.position_id = ANY(%s)")
+        params.append([
+            position_id for position_id, (title, level) in positions.items()
+            if (not position_filter or title == position_filter)
+            and (not level_filter or level == level_filter)
+        ])
+    else:
+        if position_filter:
+            conditions.append("p.title = %s")
+            params.append(position_filter)
+
+        if level_filter:
+            conditions.append("p.level = %s")
+            params.append(level_filter)
+
+    if salary_min is not None and salary_min != "":
+        conditions.append("e.salary >= %s")
+        params.append(int(salary_min))
+
+    if salary_max is not None and salary_max != "":
+        conditions.append("e.salary <= %s")
+        params.append(int(salary_max))
+
+    return conditions, params
+
+
+def normalize_sort(sort_field, sort_order):
+    """Приводит поле и порядок сортировки к допустимым значениям"""
+    if sort_field not in SORT_FIELDS:
+        sort_field = "id"
+
+    sort_order = (sort_order or "ASC").upper()
+    if sort_order not in ("ASC", "DESC"):
+        sort_order = "ASC"
+
+    return sort_field, sort_order
+
+
+def page_key(row, sort_field):
+    """Ключ keyset-пагинации для строки: (значение поля сортировки, id)"""
+    value = row[SORT_FIELDS[sort_field][1]]
+    if value is None and sort_field in ("position", "level"):
+        value = ""
+    return value, row[0]
+
+
+def build_employees_query(conditions, params, sort_field="id", sort_order="ASC",
+                          limit=None, after=None, before=None, select=EMPLOYEES_SELECT):
+    """Собирает SQL списка сотрудников с фильтрами, сортировкой и keyset-ключом
+
+    after - ключ последней строки предыдущей страницы (следующая страница),
+    before - ключ первой строки текущей страницы (предыдущая страница):
+    в этом случае порядок обратный и результат нужно развернуть.
+    Возвращает (sql, params).
+    """
+    sort_field, sort_order = normalize_sort(sort_field, sort_order)
+    sort_expr = SORT_FIELDS[sort_field][0]
+
+    if before is not None:
+        sort_order = "DESC" if sort_order == "ASC" else "ASC"
+
+    conditions = list(conditions)
+    params = list(params)
+    key = before if before is not None else after
+    if key is not None:
+        op = ">" if sort_order == "ASC" else "<"
+        if sort_field == "hire_date":
+            # По сравнению строк PostgreSQL не отсекает секции по hire_date
+            # (см. partitions.py) - нужно отдельное условие на само поле
+            conditions.append(f"{sort_expr} {op}= %s")
+            params.append(key[0])
+        conditions.append(f"({sort_expr}, e.id) {op} (%s, %s)")
+        params.extend(key)
+
+    sql = select
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {sort_expr} {sort_order}, e.id {sort_order}"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+
+    return sql, params
+
+
+# Подготовленные операторы: соединение -> имена. Слабые ссылки: запись
+# исчезает вместе с закрытым и выброшенным пулом соединением
+_prepared = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+
+def execute_prepared(cursor, sql, params):
+    """Выполняет запрос через PREPARE/EXECUTE
+
+    Текст SQL с %s-параметрами - это форма запроса: значения фильтров и
+    ключа страницы передаются параметрами, поэтому форм немного. Оператор
+    готовится при первом выполнении формы на соединении, дальше сервер
+    пропускает разбор и планирование.
+    """
+    name = "employees_" + hashlib.md5(sql.encode()).hexdigest()[:16]
+    conn = cursor.connection
+    with _prepared_lock:
+        names = _prepared.setdefault(conn, set())
+
+    if name not in names:
+        parts = sql.split("%s")
+        text = parts[0] + "".join(f"${i}{part}" for i, part in enumerate(parts[1:], 1))
+        cursor.execute(f"PREPARE {name} AS {text}")
+        names.add(name)
+
+    if params:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cursor.execute(f"EXECUTE {name}")
+
+
+def iter_employees(conn, conditions, params, sort_field="id", sort_order="ASC",
+                   limit=None, after=None, itersize=ITERSIZE, batches=False,
+                   select=EMPLOYEES_SELECT, prepared=False):
+    """Лениво отдает сотрудников, не держа весь результат в памяти
+
+    Строки читаются через именованный (серверный) курсор порциями по
+    itersize. При batches=True отдаются списки строк (по порции за раз).
+    Если limit не больше itersize, результат укладывается в одну порцию,
+    и используется обычный курсор - без лишних DECLARE/CLOSE; с
+    prepared=True запрос в этом случае идет через execute_prepared().
+    """
+    sql, params = build_employees_query(conditions, params, sort_field, sort_order,
+                                        limit=limit, after=after, select=select)
+
+    server_side = limit is None or limit > itersize
+    if server_side:
+        cursor = conn.cursor(name=f"employees_stream_{next(_cursor_ids)}")
+        cursor.itersize = itersize
+    else:
+        cursor = conn.cursor()
+
+    try:
+        if prepared and not server_side:
+            execute_prepared(cursor, sql, params)
+        else:
+            cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(itersize)
+            if not rows:
+                break
+            if batches:
+                yield rows
+            else:
+                yield from rows
+    finally:
+        cursor.close()
+
+
+def enrich_rows(cursor, rows, positions):
+    """Дополняет строки EMPLOYEES_SELECT_BARE должностью и именем руководителя из кэша
+
+    Возвращает строки в формате EMPLOYEES_SELECT.
+    """
+    managers = get_manager_names(cursor, [row[7] for row in rows])
+    enriched = []
+    for employee_id, first_name, last_name, middle_name, position_id, hire_date, salary, manager_id in rows:
+        title, level = positions.get(position_id, (None, None))
+        enriched.append((employee_id, first_name, last_name, middle_name, title, level,
+                         hire_date, salary, managers.get(manager_id)))
+    return enriched
+
+
+def page_select(sort_field, positions=None):
+    """SELECT страницы списка: без соединений, если должности есть в кэше
+
+    Сортировка по должности или уровню по-прежнему требует соединения.
+    """
+    if positions is not None and sort_field not in ("position", "level"):
+        return EMPLOYEES_SELECT_BARE
+    return EMPLOYEES_SELECT
+
+
+def fetch_employees_page(conn, conditions, params, sort_field="id", sort_order="ASC",
+                         limit=PAGE_SIZE, after=None, before=None, positions=None, prepared=False):
+    """Возвращает одну страницу сотрудников (см. build_employees_query)
+
+    С positions (словарь должностей из кэша, условия из build_filters с тем же
+    positions) страница читается без соединений и дополняется из кэша.
+    Сортировка по должности или уровню по-прежнему требует соединения.
+    """
+    select = page_select(sort_field, positions)
+    cached = select is EMPLOYEES_SELECT_BARE
+
+    if before is None:
+        rows = list(iter_employees(conn, conditions, params, sort_field, sort_order,
+                                   limit=limit, after=after, select=select, prepared=prepared))
+    else:
+        sql, params = build_employees_query(conditions, params, sort_field, sort_order,
+                                            limit=limit, before=before, select=select)
+        with conn.cursor() as cursor:
+            if prepared:
+                execute_prepared(cursor, sql, params)
+            else:
+                cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        rows.reverse()
+
+    if cached:
+        with conn.cursor() as cursor:
+            rows = enrich_rows(cursor, rows, positions)
+    return rows
+
+
+def count_employees(cursor, conditions, params, exact=False):
+    """Число сотрудников под фильтрами
+
+    Без фильтров (и без exact=True) берется оценка из статистики
+    pg_class.reltuples - она не требует полного прохода по таблице.
+    У секционированной таблицы оценка - сумма по секциям.
+    Возвращает (число, признак точного значения).
+    """
+    if not conditions and not exact:
+        cursor.execute("""
+            SELECT COALESCE(CASE WHEN c.relkind = 'p' THEN (
+                       SELECT SUM(GREATEST(s.reltuples, 0))
+                       FROM pg_inherits i
+                       JOIN pg_class s ON s.oid = i.inhrelid
+                       WHERE i.inhparent = c.oid
+                   ) ELSE c.reltuples END, 0)::bigint
+            FROM pg_class c
+            WHERE c.oid = 'employees'::regclass
+        """)
+        estimate = cursor.fetchone()[0]
+        # reltuples = -1 (PostgreSQL 14+) или 0, пока таблица не анализировалась
+        if estimate > 0:
+            return estimate, False
+
+    sql = """
+        SELECT COUNT(*)
+        FROM employees e
+        LEFT JOIN positions p ON e.position_id = p.id
+    """
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    cursor.execute(sql, params)
+    return cursor.fetchone()[0], True
+
+
+def normalize_filters(position_filter=None, level_filter=None, salary_min=None, salary_max=None):
+    """Приводит фильтры к каноническому виду для ключа кэша
+
+    Пустые строки становятся None, зарплаты - int (ValueError при ошибке).
+    """
+    def text(value):
+        value = (value or "").strip()
+        return value or None
+
+    def number(value):
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return None
+        return int(value)
+
+    return (text(position_filter), text(level_filter), number(salary_min), number(salary_max))
+
+
+def get_employees_page(conn, filters=(None, None, None, None), sort_field="id", sort_order="ASC",
+                       limit=PAGE_SIZE, after=None, before=None, use_cache=True):
+    """Страница сотрудников по фильтрам (кортеж из normalize_filters)
+
+    Результат кэшируется по (версия employees, фильтры, сортировка, размер
+    и ключ страницы). Запросы выполняются как подготовленные операторы.
+    """
+    sort_field, sort_order = normalize_sort(sort_field, sort_order)
+    key = ("page", table_version("employees"), tuple(filters), sort_field, sort_order, limit,
+           tuple(after) if after is not None else None,
+           tuple(before) if before is not None else None)
+    if use_cache:
+        rows = results_cache.get(key)
+        if rows is not None:
+            return list(rows)
+
+    with conn.cursor() as cursor:
+        positions = get_positions(cursor)
+    conditions, params = build_filters(*filters, positions=positions)
+    rows = fetch_employees_page(conn, conditions, params, sort_field, sort_order, limit,
+                                after=after, before=before, positions=positions, prepared=True)
+    if use_cache:
+        results_cache.set(key, tuple(rows))
+    return rows
+
+
+def list_employees(conn, position_filter=None, level_filter=None, salary_min=None, salary_max=None,
+                   sort_field="id", sort_order="ASC", limit=PAGE_SIZE, after=None):
+    """Список сотрудников (строки EMPLOYEES_SELECT) - get_employees_page() с фильтрами-аргументами
+
+    after - page_key() последней строки предыдущего вызова.
+    """
+    filters = normalize_filters(position_filter, level_filter, salary_min, salary_max)
+    return get_employees_page(conn, filters, sort_field, sort_order, limit, after=after)
+
+
+def get_employee(cursor, employee_id):
+    """Один сотрудник (строка EMPLOYEES_SELECT) или None"""
+    cursor.execute(EMPLOYEES_SELECT + " WHERE e.id = %s", (employee_id,))
+    return cursor.fetchone()
+
+
+def get_employee_count(conn, filters=(None, None, None, None), exact=False, use_cache=True):
+    """count_employees() по фильтрам из normalize_filters с кэшем результатов"""
+    key = ("count", table_version("employees"), tuple(filters), exact)
+    if use_cache:
+        result = results_cache.get(key)
+        if result is not None:
+            return result
+
+    with conn.cursor() as cursor:
+        positions = get_positions(cursor)
+        conditions, params = build_filters(*filters, positions=positions)
+        result = count_employees(cursor, conditions, params, exact)
+    if use_cache:
+        results_cache.set(key, result)
+    return result
+
+
+STATS_PERCENTILES = (0.25, 0.5, 0.75, 0.9)
+STATS_HEADERS = ["Сотрудников", "Средняя", "Минимальная", "Максимальная",
+                 "P25", "Медиана", "P75", "P90"]
+
+
+def salary_totals(cursor, conditions, params):
+    """(count, avg, min, max) зарплат под фильтрами - один агрегат без сортировок
+
+    Соединение с positions планировщик убирает, если условия его не используют.
+    """
+    sql = """
+        SELECT COUNT(*), ROUND(AVG(e.salary), 2), MIN(e.salary), MAX(e.salary)
+        FROM employees e
+        LEFT JOIN positions p ON e.position_id = p.id
+    """
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    cursor.execute(sql, params)
+    return cursor.fetchone()
+
+
+def get_salary_totals(conn, filters=(None, None, None, None), use_cache=True):
+    """salary_totals() по фильтрам из normalize_filters с кэшем результатов"""
+    key = ("totals", table_version("employees"), tuple(filters))
+    if use_cache:
+        result = results_cache.get(key)
+        if result is not None:
+            return result
+
+    with conn.cursor() as cursor:
+        positions = get_positions(cursor)
+        conditions, params = build_filters(*filters, positions=positions)
+        result = salary_totals(cursor, conditions, params)
+    if use_cache:
+        results_cache.set(key, result)
+    return result
+
+
+def employee_stats(cursor, conditions, params):
+    """Статистика зарплат под теми же фильтрами, что и список
+
+    Считается в БД одним запросом с GROUPING SETS: по всей выборке,
+    по должностям и по уровням. Возвращает словарь
+    {"total": строка, "by_position": [...], "by_level": [...]}, где
+    строка - (count, avg, min, max, p25, p50, p75, p90), а строки
+    разбивок начинаются с должности и уровня (или только уровня).
+    """
+    sql = """
+        SELECT GROUPING(p.title, p.level) AS grouping_id,
+               p.title, p.level,
+               COUNT(*), ROUND(AVG(e.salary), 2), MIN(e.salary), MAX(e.salary),
+               percentile_cont(%s::float8[]) WITHIN GROUP (ORDER BY e.salary)
+        FROM employees e
+        LEFT JOIN positions p ON e.position_id = p.id
+    """
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += """
+        GROUP BY GROUPING SETS ((), (p.title, p.level), (p.level))
+        ORDER BY grouping_id, p.level, p.title
+    """
+    cursor.execute(sql, [list(STATS_PERCENTILES)] + list(params))
+
+    stats = {"total": None, "by_position": [], "by_level": []}
+    for grouping_id, title, level, count, avg, min_salary, max_salary, percentiles in cursor:
+        values = (count, avg, min_salary, max_salary) + tuple(percentiles or ())
+        # GROUPING(): 0 - по должности и уровню, 2 - только по уровню, 3 - итог
+        if grouping_id == 3:
+            stats["total"] = values
+        elif grouping_id == 2:
+            stats["by_level"].append((level,) + values)
+        else:
+            stats["by_position"].append((title, level) + values)
+
+    if stats["total"] is None:
+        stats["total"] = (0, None, None, None) + (None,) * len(STATS_PERCENTILES)
+    return stats
+
+
+EMPLOYEE_FIELDS = ("first_name", "last_name", "middle_name", "position_id",
+                   "hire_date", "salary", "manager_id")
+
+
+def _text(row, name, required):
+    value = row.get(name)
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == "":
+        if required:
+            raise ValueError(f"не заполнено поле {name}")
+        return None
+    value = str(value)
+    if len(value) > 100:
+        raise ValueError(f"поле {name} длиннее 100 символов")
+    return value
+
+
+# Диапазон столбцов INTEGER: значение вне его прервало бы всю вставку
+INT4_MIN = -2 ** 31
+INT4_MAX = 2 ** 31 - 1
+
+
+def _integer(row, name, required):
+    value = row.get(name)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            raise ValueError(f"не заполнено поле {name}")
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"поле {name} должно быть целым числом: {value!r}")
+    if not INT4_MIN <= value <= INT4_MAX:
+        raise ValueError(f"поле {name} вне диапазона INTEGER: {value}")
+    return value
+
+
+def validate_employee(row, position_ids, manager_ids):
+    """Проверяет одну запись (словарь с полями EMPLOYEE_FIELDS)
+
+    position_ids и manager_ids - заранее загруженные множества допустимых
+    значений, так что проверка не обращается к БД. Запись, которая не
+    является словарем, - ошибка; ValueError на месте записи (ошибка
+    чтения файла, см. main.read_import_rows) выдается как текст ошибки.
+    Возвращает (кортеж значений в порядке EMPLOYEE_FIELDS, None)
+    или (None, текст ошибки).
+    """
+    if isinstance(row, ValueError):
+        return None, str(row)
+    if not isinstance(row, dict):
+        return None, f"запись должна быть объектом с полями, получено: {type(row).__name__}"
+
+    try:
+        first_name = _text(row, "first_name", True)
+        last_name = _text(row, "last_name", True)
+        middle_name = _text(row, "middle_name", False)
+
+        position_id = _integer(row, "position_id", True)
+        if position_id not in position_ids:
+            raise ValueError(f"нет должности с ID {position_id}")
+
+        hire_date = row.get("hire_date")
+        if not isinstance(hire_date, date):
+            try:
+                hire_date = date.fromisoformat(str(hire_date or "").strip())
+            except ValueError:
+                raise ValueError(f"дата приема должна быть в формате ГГГГ-ММ-ДД: {hire_date!r}")
+
+        salary = _integer(row, "salary", True)
+        if salary < 0:
+            raise ValueError("зарплата не может быть отрицательной")
+
+        manager_id = _integer(row, "manager_id", False)
+        if manager_id is not None and manager_id not in manager_ids:
+            raise ValueError(f"нет сотрудника-руководителя с ID {manager_id}")
+
+    except ValueError as e:
+        return None, str(e)
+
+    return (first_name, last_name, middle_name, position_id, hire_date, salary, manager_id), None
+
+
+def add_employees(conn, rows, commit=True, start=1, page_size=1000):
+    """Добавляет сотрудников пакетом
+
+    Все записи проверяются в памяти: должности - по кэшу positions,
+    руководители - по множеству id, загруженному одним запросом.
+    Корректные записи вставляются через execute_values в одной транзакции,
+    ошибочные пропускаются и попадают в отчет, не прерывая пакет.
+
+    start - номер первой записи в отчете об ошибках (для импорта по частям).
+    Возвращает {"inserted": [id], "errors": [(номер записи, текст ошибки)]}.
+    """
+    rows = list(rows)
+    with conn.cursor() as cursor:
+        position_ids = set(get_positions(cursor))
+
+        referenced = set()
+        for row in rows:
+            if not isinstance(row, dict):
+                continue
+            try:
+                manager_id = _integer(row, "manager_id", False)
+            except ValueError:
+                continue
+            if manager_id is not None:
+                referenced.add(manager_id)
+        cursor.execute("SELECT id FROM employees WHERE id = ANY(%s)", (list(referenced),))
+        manager_ids = {employee_id for (employee_id,) in cursor.fetchall()}
+
+        valid = []
+        errors = []
+        for number, row in enumerate(rows, start):
+            values, error = validate_employee(row, position_ids, manager_ids)
+            if error:
+                errors.append((number, error))
+            else:
+                valid.append(values)
+
+        inserted = []
+        if valid:
+            inserted = psycopg2.extras.execute_values(
+                cursor,
+                f"""
+                    INSERT INTO employees ({', '.join(EMPLOYEE_FIELDS)})
+                    VALUES %s
+                    RETURNING id, manager_id
+                """,
+                valid,
+                page_size=page_size,
+                fetch=True
+            )
+            if closure_exists(cursor):
+                add_many_to_closure(cursor, inserted)
+
+    if commit:
+        conn.commit()
+    if inserted:
+        bump_table_version("employees")
+    return {"inserted": [employee_id for employee_id, _ in inserted], "errors": errors}
+
+
+def create_employee(conn, first_name, last_name, position_id, hire_date, salary,
+                    middle_name=None, manager_id=None):
+    """Добавляет одного сотрудника с теми же проверками, что add_employees()
+
+    Возвращает id; при ошибке проверки - ValueError, ничего не вставляется.
+    """
+    result = add_employees(conn, [dict(first_name=first_name, last_name=last_name,
+                                       middle_name=middle_name, position_id=position_id,
+                                       hire_date=hire_date, salary=salary,
+                                       manager_id=manager_id)])
+    if result["errors"]:
+        raise ValueError(result["errors"][0][1])
+    return result["inserted"][0]
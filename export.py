@@ -0,0 +1,117 @@
+"""Потоковая выгрузка списка сотрудников в CSV, JSONL и Parquet
+
+Выгружается тот же список, что показывает show_employees: те же фильтры
+(normalize_filters) и сортировка, но без ограничения размером страницы.
+Расход памяти не зависит от числа строк:
+
+- CSV - COPY (SELECT ...) TO STDOUT, сервер сам формирует CSV, а
+  psycopg2 пишет поток прямо в файл;
+- JSONL и Parquet - порции по EXPORT_BATCH_SIZE строк из серверного
+  курсора (employees.iter_employees); для Parquet каждая порция
+  становится Arrow RecordBatch и сразу записывается в файл.
+
+Для Parquet нужен pyarrow (pip install pyarrow).
+"""
+import json
+from datetime import date
+
+from employees import build_filters, build_employees_query, iter_employees
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Имена столбцов EMPLOYEES_SELECT
+EXPORT_COLUMNS = ["id", "first_name", "last_name", "middle_name", "position", "level",
+                  "hire_date", "salary", "manager"]
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+EXPORT_BATCH_SIZE = 10000
+
+
+def export_csv(conn, f, conditions, params, sort_field="id", sort_order="ASC", limit=None):
+    """Пишет CSV с заголовком в бинарный файл f через COPY TO STDOUT"""
+    sql, params = build_employees_query(conditions, params, sort_field, sort_order, limit=limit)
+    with conn.cursor() as cursor:
+        # COPY не принимает параметры, поэтому они подставляются заранее
+        query = cursor.mogrify(sql, params).decode()
+        cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", f)
+        return cursor.rowcount
+
+
+def json_default(value):
+    """default для json.dumps: даты - в ISO 8601"""
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} не сериализуется в JSON")
+
+
+def export_jsonl(conn, f, conditions, params, sort_field="id", sort_order="ASC", limit=None,
+                 batch_size=EXPORT_BATCH_SIZE):
+    """Пишет по объекту JSON на строку в бинарный файл f"""
+    count = 0
+    for rows in iter_employees(conn, conditions, params, sort_field, sort_order, limit=limit,
+                               itersize=batch_size, batches=True):
+        f.write("".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False, default=json_default) + "\n"
+            for row in rows
+        ).encode())
+        count += len(rows)
+    return count
+
+
+def parquet_schema():
+    return pa.schema([
+        ("id", pa.int32()),
+        ("first_name", pa.string()),
+        ("last_name", pa.string()),
+        ("middle_name", pa.string()),
+        ("position", pa.string()),
+        ("level", pa.string()),
+        ("hire_date", pa.date32()),
+        ("salary", pa.int32()),
+        ("manager", pa.string()),
+    ])
+
+
+def export_parquet(conn, f, conditions, params, sort_field="id", sort_order="ASC", limit=None,
+                   batch_size=EXPORT_BATCH_SIZE):
+    """Пишет Parquet в бинарный файл f: одна порция курсора - один RecordBatch"""
+    if pa is None:
+        raise RuntimeError("для выгрузки в Parquet установите pyarrow")
+
+    schema = parquet_schema()
+    count = 0
+    with pq.ParquetWriter(f, schema) as writer:
+        for rows in iter_employees(conn, conditions, params, sort_field, sort_order, limit=limit,
+                                   itersize=batch_size, batches=True):
+            columns = [pa.array(column, type=field.type) for column, field in zip(zip(*rows), schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+            count += len(rows)
+    return count
+
+
+EXPORTERS = {"csv": export_csv, "jsonl": export_jsonl, "parquet": export_parquet}
+
+
+def export_format(path, fmt=None):
+    """Формат выгрузки: явно заданный или по расширению файла (по умолчанию CSV)"""
+    if fmt:
+        return fmt
+    for name in EXPORT_FORMATS:
+        if path.endswith("." + name):
+            return name
+    return "csv"
+
+
+def export_employees(conn, path, filters=(None, None, None, None), sort_field="id",
+                     sort_order="ASC", limit=None, fmt=None):
+    """Выгружает сотрудников по фильтрам (кортеж из normalize_filters) в файл
+
+    Возвращает число выгруженных строк.
+    """
+    conditions, params = build_filters(*filters)
+    exporter = EXPORTERS[export_format(path, fmt)]
+    with open(path, "wb") as f:
+        return exporter(conn, f, conditions, params, sort_field, sort_order, limit)
@@ -1,15 +1,38 @@
 import psycopg2
+import psycopg2.extras
 from tabulate import tabulate
 from mimesis import Person, Datetime, Finance, Text, Address
 from mimesis.enums import Gender
 import random
-from datetime import datetime, timedelta
+import io
+import os
+import sys
+import itertools
+import argparse
+import csv
+import json
+import multiprocessing
+from array import array
+import time
+from datetime import date, datetime, timedelta
+
+import config
+from cache import get_positions, invalidate_employee, invalidate_all, print_cache_stats
+from db_pool import get_connection, release_connection, print_pool_stats
+from instrumentation import load_log, print_query_stats, slow_plans, write_prometheus
+from employees import (EMPLOYEE_HEADERS, STATS_HEADERS, PAGE_SIZE, SORT_FIELDS, build_filters, normalize_filters,
+                       normalize_sort, page_key, get_employees_page, get_employee_count, get_salary_totals,
+                       employee_stats, add_employees, create_employee, build_employees_query,
+                       iter_employees)
+from hierarchy import (MAX_DEPTH, SUBTREE_HEADERS, CHAIN_HEADERS, ROLLUP_HEADERS, get_subtree,
+                       get_chain_of_command, get_headcount_rollup, closure_exists, rebuild_closure,
+                       is_subordinate, count_reports, get_depth)
+from name_pool import DEFAULT_POOL_SIZE, load_name_pools
+from export import EXPORT_FORMATS, export_employees
+from table_stream import query_widths, stream_table
+from search import create_search_index, search_employees, search_key
+from partitions import PARTITION_SCHEMES, create_partitions, employee_partitions, route_rows
 
-# Данные для подключения
-DB_NAME = "test"
-DB_USER = "postgres"
-DB_PASSWORD = "12345678"
-DB_HOST = "localhost"
 
 # Инициализация генераторов данных
 person = Person('ru')
@@ -20,13 +43,9 @@ address = Address()
 
 
 def connect_to_db():
+    """Открывает отдельное соединение вне пула (для процессов-воркеров)"""
     try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST
-        )
+        conn = psycopg2.connect(**config.connect_kwargs())
         print("✅ Успешное подключение к БД")
         return conn
     except Exception as e:
@@ -34,142 +53,413 @@ def connect_to_db():
         return None
 
 
-def show_employees():
-    conn = connect_to_db()
+def prompt_employee_query():
+    """Запрашивает фильтры и сортировку списка сотрудников"""
+    print("\nПараметры отображения списка сотрудников:")
+
+    print("\nФильтрация (оставьте пустым, если не нужно):")
+    position_filter = input("Должность (например 'Разработчик'): ").strip()
+    level_filter = input("Уровень (например 'Junior'): ").strip()
+    salary_min = input("Минимальная зарплата: ").strip()
+    salary_max = input("Максимальная зарплата: ").strip()
+
+    print("\nСортировка:")
+    print("Доступные поля: id, first_name, last_name, position, level, hire_date, salary")
+    sort_field = input("Поле для сортировки (по умолчанию id): ").strip() or "id"
+    sort_order = input("Порядок (ASC/DESC, по умолчанию ASC): ").strip().upper() or "ASC"
+
+    return dict(position_filter=position_filter, level_filter=level_filter,
+                salary_min=salary_min, salary_max=salary_max,
+                sort_field=sort_field, sort_order=sort_order)
+
+
+def browse_employees():
+    """Пункт меню: фильтры из input() и постраничный просмотр"""
+    show_employees(**prompt_employee_query(), interactive=True)
+
+
+def stream_employees(conn, filters, sort_field="id", sort_order="ASC", limit=None, widths="sample"):
+    """Печатает всех сотрудников по фильтрам по мере чтения из серверного курсора
+
+    Ширина столбцов - по первым строкам (widths="sample") или по схеме
+    результата (widths="schema"), так что вывод начинается сразу, а в
+    памяти держится одна порция курсора. Возвращает число строк.
+    """
+    conditions, params = build_filters(*filters)
+    column_widths = None
+    if widths == "schema":
+        sql, query_params = build_employees_query(conditions, params, sort_field, sort_order,
+                                                  limit=limit)
+        with conn.cursor() as cursor:
+            column_widths = query_widths(cursor, sql, query_params, EMPLOYEE_HEADERS)
+
+    rows = iter_employees(conn, conditions, params, sort_field, sort_order, limit=limit)
+    try:
+        return stream_table(rows, EMPLOYEE_HEADERS, column_widths)
+    finally:
+        rows.close()
+
+
+def show_employees(position_filter=None, level_filter=None, salary_min=None, salary_max=None,
+                   sort_field="id", sort_order="ASC", limit=PAGE_SIZE, interactive=False,
+                   stream=False, widths="sample", stats=True):
+    """Выводит сотрудников по фильтрам
+
+    По умолчанию печатает первые limit строк и возвращается;
+    interactive=True - постраничный просмотр с навигацией через input();
+    stream=True - все строки (или первые limit) потоком, см. stream_employees().
+
+    stats=True - после списка (кроме постраничного просмотра) печатаются
+    средняя, минимальная и максимальная зарплата по всей выборке (один
+    агрегат с кэшем, см. get_salary_totals); полная статистика - по "s"
+    в постраничном просмотре.
+    """
+    conn = get_connection()
     if not conn:
         return
 
     try:
         cursor = conn.cursor()
 
-        # Запрашиваем параметры фильтрации и сортировки
-        print("\nПараметры отображения списка сотрудников:")
-
-        # Фильтрация
-        print("\nФильтрация (оставьте пустым, если не нужно):")
-        position_filter = input("Должность (например 'Разработчик'): ").strip()
-        level_filter = input("Уровень (например 'Junior'): ").strip()
-        salary_min = input("Минимальная зарплата: ").strip()
-        salary_max = input("Максимальная зарплата: ").strip()
-
-        # Сортировка
-        print("\nСортировка:")
-        print("Доступные поля: id, first_name, last_name, position, level, hire_date, salary")
-        sort_field = input("Поле для сортировки (по умолчанию id): ").strip() or "id"
-        sort_order = input("Порядок (ASC/DESC, по умолчанию ASC): ").strip().upper() or "ASC"
-
-        # Формируем SQL запрос
-        sql = """
-            SELECT e.id, e.first_name, e.last_name, e.middle_name, 
-                   p.title as position, p.level, e.hire_date, e.salary, 
-                   m.first_name || ' ' || m.last_name as manager
-            FROM employees e
-            LEFT JOIN positions p ON e.position_id = p.id
-            LEFT JOIN employees m ON e.manager_id = m.id
-        """
-
-        # Добавляем условия фильтрации
-        conditions = []
-        params = []
-
-        if position_filter:
-            conditions.append("p.title = %s")
-            params.append(position_filter)
-
-        if level_filter:
-            conditions.append("p.level = %s")
-            params.append(level_filter)
-
-        if salary_min:
-            conditions.append("e.salary >= %s")
-            params.append(int(salary_min))
-
-        if salary_max:
-            conditions.append("e.salary <= %s")
-            params.append(int(salary_max))
-
-        if conditions:
-            sql += " WHERE " + " AND ".join(conditions)
-
-        # Добавляем сортировку
-        valid_sort_fields = ['id', 'first_name', 'last_name', 'position', 'level', 'hire_date', 'salary']
-        if sort_field not in valid_sort_fields:
-            sort_field = 'id'
-
-        if sort_order not in ['ASC', 'DESC']:
-            sort_order = 'ASC'
-
-        sql += f" ORDER BY {sort_field} {sort_order}"
-
-        # Выполняем запрос
-        cursor.execute(sql, params)
-        employees = cursor.fetchall()
-
-        # Ограничиваем вывод 50 записями для удобства просмотра
-        if len(employees) > 50:
-            print(f"\n⚠️ Найдено {len(employees)} записей. Показаны первые 50.")
-            employees = employees[:50]
-
-        # Выводим результаты
-        if employees:
-            headers = ["ID", "Имя", "Фамилия", "Отчество", "Должность", "Уровень", "Дата приема", "Зарплата",
-                       "Менеджер"]
-            print(tabulate(employees, headers=headers, tablefmt="grid"))
-
-            # Статистика
-            print(f"\nВсего найдено: {len(employees)} сотрудников")
-            if employees:
-                salaries = [emp[7] for emp in employees]
-                print(f"Средняя зарплата: {sum(salaries) / len(salaries):.2f}")
-                print(f"Минимальная зарплата: {min(salaries)}")
-                print(f"Максимальная зарплата: {max(salaries)}")
-        else:
+        filters = normalize_filters(position_filter, level_filter, salary_min, salary_max)
+        sort_field, sort_order = normalize_sort(sort_field, sort_order)
+
+        if stream:
+            count = stream_employees(conn, filters, sort_field, sort_order, limit, widths)
+            print(f"\nВыведено сотрудников: {count}")
+            if stats and count:
+                print_salary_totals(conn, filters)
+            return
+
+        total, exact = get_employee_count(conn, filters)
+        if not total:
             print("❌ Сотрудники не найдены по заданным критериям")
+            return
+
+        # Постраничный вывод: на каждом шаге из БД читается только одна страница
+        page = 1
+        employees = get_employees_page(conn, filters, sort_field, sort_order, limit)
+        while True:
+            if not employees:
+                print("❌ Сотрудники не найдены по заданным критериям")
+                break
+
+            print(tabulate(employees, headers=EMPLOYEE_HEADERS, tablefmt="grid"))
+            print(f"\nСтраница {page}. Всего найдено: {'' if exact else '~'}{total} сотрудников")
+            if not interactive:
+                if stats:
+                    print_salary_totals(conn, filters)
+                break
+
+            action = input("\nn - следующая страница, p - предыдущая, s - статистика зарплат, "
+                           "a - все строки, Enter - выход: ").strip().lower()
+            if action == "s":
+                show_employee_stats(cursor, filters)
+                continue
+            if action == "a":
+                stream_employees(conn, filters, sort_field, sort_order)
+                continue
+            if action == "n":
+                next_page = get_employees_page(conn, filters, sort_field, sort_order, limit,
+                                               after=page_key(employees[-1], sort_field))
+                if not next_page:
+                    print("⚠️ Это последняя страница")
+                    continue
+                employees = next_page
+                page += 1
+            elif action == "p":
+                if page == 1:
+                    print("⚠️ Это первая страница")
+                    continue
+                employees = get_employees_page(conn, filters, sort_field, sort_order, limit,
+                                               before=page_key(employees[0], sort_field))
+                page -= 1
+            else:
+                break
 
     except ValueError:
         print("❌ Ошибка: некорректный формат числа для зарплаты")
+    except BrokenPipeError:
+        raise
     except Exception as e:
         print(f"❌ Ошибка при получении данных: {e}")
     finally:
-        conn.close()
+        release_connection(conn)
 
 
-def add_employee():
-    conn = connect_to_db()
-    if conn:
-        try:
-            print("\nДобавление нового сотрудника:")
-            first_name = input("Имя: ")
-            last_name = input("Фамилия: ")
-            middle_name = input("Отчество (если есть, иначе Enter): ") or None
-            position_id = input("ID должности: ")
-            hire_date = input("Дата приема (ГГГГ-ММ-ДД): ")
-            salary = input("Зарплата: ")
-            manager_id = input("ID менеджера (если есть, иначе Enter): ") or None
+def print_salary_totals(conn, filters):
+    """Средняя, минимальная и максимальная зарплата по выборке (под списком)"""
+    count, avg, min_salary, max_salary = get_salary_totals(conn, filters)
+    if not count:
+        return
+    print(f"Средняя зарплата: {avg:.2f}")
+    print(f"Минимальная зарплата: {min_salary}")
+    print(f"Максимальная зарплата: {max_salary}")
 
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO employees 
-                (first_name, last_name, middle_name, position_id, hire_date, salary, manager_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (first_name, last_name, middle_name, position_id, hire_date, salary, manager_id))
 
-            conn.commit()
-            print("✅ Сотрудник успешно добавлен")
+def show_employee_stats(cursor, filters):
+    """Выводит статистику зарплат по всей выборке, должностям и уровням"""
+    conditions, params = build_filters(*filters)
+    stats = employee_stats(cursor, conditions, params)
 
-        except Exception as e:
-            print(f"❌ Ошибка при добавлении сотрудника: {e}")
-        finally:
-            conn.close()
+    count, avg, min_salary, max_salary = stats["total"][:4]
+    print(f"\nВсего найдено: {count} сотрудников")
+    if not count:
+        return
+    print(f"Средняя зарплата: {avg:.2f}")
+    print(f"Минимальная зарплата: {min_salary}")
+    print(f"Максимальная зарплата: {max_salary}")
+
+    print("\nПо должностям:")
+    print(tabulate(stats["by_position"], headers=["Должность", "Уровень"] + STATS_HEADERS,
+                   tablefmt="grid", floatfmt=".0f"))
+    print("\nПо уровням:")
+    print(tabulate(stats["by_level"], headers=["Уровень"] + STATS_HEADERS,
+                   tablefmt="grid", floatfmt=".0f"))
+
+
+def prompt_new_employee():
+    """Запрашивает поля нового сотрудника"""
+    print("\nДобавление нового сотрудника:")
+    return dict(
+        first_name=input("Имя: "),
+        last_name=input("Фамилия: "),
+        middle_name=input("Отчество (если есть, иначе Enter): ") or None,
+        position_id=input("ID должности: "),
+        hire_date=input("Дата приема (ГГГГ-ММ-ДД): "),
+        salary=input("Зарплата: "),
+        manager_id=input("ID менеджера (если есть, иначе Enter): ") or None,
+    )
+
+
+def add_employee(first_name=None, last_name=None, position_id=None, hire_date=None, salary=None,
+                 middle_name=None, manager_id=None):
+    """Добавляет сотрудника; без аргументов поля запрашиваются через input()
+
+    Возвращает id нового сотрудника или None при ошибке.
+    """
+    if first_name is None:
+        fields = prompt_new_employee()
+    else:
+        fields = dict(first_name=first_name, last_name=last_name, middle_name=middle_name,
+                      position_id=position_id, hire_date=hire_date, salary=salary,
+                      manager_id=manager_id)
+
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        employee_id = create_employee(conn, **fields)
+        invalidate_employee(employee_id)
+        print(f"✅ Сотрудник успешно добавлен (ID {employee_id})")
+        return employee_id
+
+    except Exception as e:
+        print(f"❌ Ошибка при добавлении сотрудника: {e}")
+        conn.rollback()
+        return None
+    finally:
+        release_connection(conn)
+
+
+IMPORT_CHUNK_SIZE = 10000
+
+
+def read_import_rows(path, fmt=None):
+    """Читает записи для импорта из CSV (с заголовком) или JSONL построчно
+
+    Строка, которую не удалось разобрать, не прерывает импорт: вместо записи
+    выдается ValueError с номером строки файла, и add_employees() учитывает
+    её как ошибочную запись.
+    """
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".json")) else "csv")
+    # utf-8-sig - CSV из Excel начинается с BOM, иначе он попадет в имя первого поля
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            while True:
+                try:
+                    row = next(reader)
+                except StopIteration:
+                    return
+                except csv.Error as e:
+                    yield ValueError(f"после строки файла {reader.line_num}: ошибка CSV: {e}")
+                    continue
+                yield row
+        else:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield ValueError(f"строка файла {line_number}: неверный JSON: {e.msg}")
+
+
+def import_employees(path, fmt=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Импортирует сотрудников из файла одной транзакцией
+
+    Записи передаются в add_employees() частями по chunk_size, ошибочные
+    строки пропускаются и выводятся в отчете (номер строки данных).
+    """
+    conn = get_connection()
+    if not conn:
+        return
+
+    inserted = 0
+    errors = []
+    try:
+        started = time.perf_counter()
+        rows = read_import_rows(path, fmt)
+        number = 1
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            result = add_employees(conn, chunk, commit=False, start=number)
+            inserted += len(result["inserted"])
+            errors.extend(result["errors"])
+            number += len(chunk)
+        conn.commit()
+        print(f"✅ Импортировано {inserted} сотрудников за {time.perf_counter() - started:.1f} с")
+
+    except Exception as e:
+        print(f"❌ Ошибка при импорте: {e}")
+        conn.rollback()
+        return
+    finally:
+        release_connection(conn)
+
+    if errors:
+        print(f"❌ Пропущено строк с ошибками: {len(errors)}")
+        print(tabulate(errors[:PAGE_SIZE], headers=["Строка", "Ошибка"], tablefmt="grid"))
+        if len(errors) > PAGE_SIZE:
+            print(f"... и еще {len(errors) - PAGE_SIZE}")
+
+
+def export_employee_list(path, filters=(None, None, None, None), sort_field="id", sort_order="ASC",
+                         limit=None, fmt=None):
+    """Выгружает список сотрудников по фильтрам в CSV, JSONL или Parquet"""
+    conn = get_connection()
+    if not conn:
+        return
+
+    try:
+        started = time.perf_counter()
+        count = export_employees(conn, path, normalize_filters(*filters), sort_field, sort_order,
+                                 limit, fmt)
+        print(f"✅ Выгружено {count} сотрудников в {path} за {time.perf_counter() - started:.1f} с")
+
+    except Exception as e:
+        print(f"❌ Ошибка при выгрузке: {e}")
+    finally:
+        release_connection(conn)
+
+
+def show_search(query, limit=PAGE_SIZE, interactive=False):
+    """Поиск сотрудников по ФИО (см. search.py) с постраничным выводом"""
+    conn = get_connection()
+    if not conn:
+        return
+
+    try:
+        cursor = conn.cursor()
+        page = 1
+        rows = search_employees(cursor, query, limit)
+        while True:
+            if not rows:
+                print("❌ Сотрудники не найдены" if page == 1 else "⚠️ Это последняя страница")
+                break
+            print(tabulate([row[:-1] for row in rows], headers=EMPLOYEE_HEADERS, tablefmt="grid"))
+            print(f"\nСтраница {page}")
+            if not interactive or len(rows) < limit:
+                break
+            if input("\nn - следующая страница, Enter - выход: ").strip().lower() != "n":
+                break
+            rows = search_employees(cursor, query, limit, after=search_key(rows[-1]))
+            page += 1
+
+    except ValueError as e:
+        print(f"❌ Ошибка: {e}")
+    except Exception as e:
+        print(f"❌ Ошибка при поиске: {e}")
+    finally:
+        release_connection(conn)
+
+
+def create_name_search_index():
+    """Создает индекс поиска по ФИО для текущих данных"""
+    conn = get_connection()
+    if not conn:
+        return
+
+    try:
+        started = time.perf_counter()
+        supported = create_search_index(conn.cursor())
+        conn.commit()
+        print(f"✅ Индекс поиска по ФИО создан за {time.perf_counter() - started:.1f} с")
+        if not supported:
+            print("⚠️ pg_trgm не выделяет триграммы из кириллицы: создайте базу с UTF-8 локалью "
+                  "(например, LC_CTYPE=ru_RU.UTF-8)")
+
+    except Exception as e:
+        print(f"❌ Ошибка при создании индекса поиска: {e}")
+        conn.rollback()
+    finally:
+        release_connection(conn)
+
+
+def install_version_triggers():
+    """Создает table_versions и триггеры версий для текущих данных"""
+    conn = get_connection()
+    if not conn:
+        return
+
+    try:
+        create_version_triggers(conn)
+        conn.commit()
+        print("✅ Триггеры версий таблиц созданы")
+
+    except Exception as e:
+        print(f"❌ Ошибка при создании триггеров версий: {e}")
+        conn.rollback()
+    finally:
+        release_connection(conn)
+
+
+def show_sql_stats(log_path=None, prometheus_path=None, limit=15, show_plans=False):
+    """Сводка по SQL-запросам: из журнала SQL_LOG_FILE или текущего процесса"""
+    log_path = log_path or config.SQL_LOG_FILE
+    plans = slow_plans()
+    summaries = None
+    if log_path:
+        try:
+            summaries, plans = load_log(log_path)
+        except FileNotFoundError:
+            print(f"❌ Журнал {log_path} не найден")
+            return
+    print_query_stats(summaries, limit)
+
+    if show_plans:
+        for plan in plans[-limit:]:
+            print(f"\n[{plan['ts']}] {plan['duration_ms']:.0f} мс, {plan['shape_id']}: {plan['shape'][:100]}")
+            print(plan["plan"])
+    elif plans:
+        print(f"Планов медленных запросов: {len(plans)} (--plans - показать)")
+
+    if prometheus_path:
+        write_prometheus(prometheus_path, summaries)
+        print(f"✅ Метрики Prometheus записаны в {prometheus_path}")
 
 
 def show_positions():
-    conn = connect_to_db()
+    conn = get_connection()
     if conn:
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT id, title, level FROM positions ORDER BY id")
-            positions = cursor.fetchall()
+            positions = [(position_id, title, level)
+                         for position_id, (title, level) in get_positions(cursor).items()]
 
             headers = ["ID", "Должность", "Уровень"]
             print(tabulate(positions, headers=headers, tablefmt="grid"))
@@ -177,7 +467,151 @@ def show_positions():
         except Exception as e:
             print(f"❌ Ошибка при получении данных: {e}")
         finally:
-            conn.close()
+            release_connection(conn)
+
+
+def show_subtree(employee_id, max_depth=MAX_DEPTH, limit=PAGE_SIZE):
+    """Выводит сотрудника и всех его подчиненных"""
+    conn = get_connection()
+    if not conn:
+        return
+
+    try:
+        cursor = conn.cursor()
+        rows = get_subtree(cursor, employee_id, max_depth)
+        if not rows:
+            print(f"❌ Сотрудник {employee_id} не найден")
+            return
+
+        if len(rows) > limit:
+            print(f"\n⚠️ В поддереве {len(rows)} сотрудников. Показаны первые {limit}.")
+        # Отступ имени показывает уровень подчинения
+        table = [(row[0], row[1], "  " * row[1] + row[2]) + row[3:] for row in rows[:limit]]
+        print(tabulate(table, headers=SUBTREE_HEADERS, tablefmt="grid"))
+        print(f"\nВсего в поддереве: {len(rows)} сотрудников, глубина {rows[-1][1]}")
+        print(f"ФОТ поддерева: {sum(row[6] for row in rows)}")
+
+    except Exception as e:
+        print(f"❌ Ошибка при получении данных: {e}")
+    finally:
+        release_connection(conn)
+
+
+def show_chain_of_command(employee_id, max_depth=MAX_DEPTH):
+    """Выводит цепочку руководителей сотрудника до CEO"""
+    conn = get_connection()
+    if not conn:
+        return
+
+    try:
+        cursor = conn.cursor()
+        rows = get_chain_of_command(cursor, employee_id, max_depth)
+        if not rows:
+            print(f"❌ Сотрудник {employee_id} не найден")
+            return
+        print(tabulate(rows, headers=CHAIN_HEADERS, tablefmt="grid"))
+
+    except Exception as e:
+        print(f"❌ Ошибка при получении данных: {e}")
+    finally:
+        release_connection(conn)
+
+
+def show_headcount_rollup(max_depth=MAX_DEPTH, limit=PAGE_SIZE):
+    """Выводит численность и ФОТ подчиненных по руководителям"""
+    conn = get_connection()
+    if not conn:
+        return
+
+    try:
+        cursor = conn.cursor()
+        rows = get_headcount_rollup(cursor, max_depth, limit)
+        if not rows:
+            print("❌ Руководители не найдены")
+            return
+        print(tabulate(rows, headers=ROLLUP_HEADERS, tablefmt="grid"))
+
+    except Exception as e:
+        print(f"❌ Ошибка при получении данных: {e}")
+    finally:
+        release_connection(conn)
+
+
+def hierarchy_menu():
+    print("\nИерархия:")
+    print("1. Подчиненные сотрудника (поддерево)")
+    print("2. Цепочка руководителей до CEO")
+    print("3. Численность и ФОТ по руководителям")
+    print("4. Проверить подчиненность (таблица замыкания)")
+    print("5. Перестроить таблицу замыкания")
+
+    choice = input("Выберите действие (1-5): ")
+    try:
+        if choice == "1":
+            show_subtree(int(input("ID сотрудника: ")))
+        elif choice == "2":
+            show_chain_of_command(int(input("ID сотрудника: ")))
+        elif choice == "3":
+            show_headcount_rollup()
+        elif choice == "4":
+            employee_id = int(input("ID сотрудника: "))
+            show_is_subordinate(employee_id, int(input("ID руководителя: ")))
+        elif choice == "5":
+            rebuild_employee_closure()
+        else:
+            print("❌ Неверный ввод")
+    except ValueError:
+        print("❌ Ошибка: ID сотрудника должен быть числом")
+
+
+def show_is_subordinate(employee_id, manager_id):
+    """Проверяет по таблице замыкания, подчинен ли сотрудник руководителю"""
+    conn = get_connection()
+    if not conn:
+        return
+
+    try:
+        cursor = conn.cursor()
+        if not closure_exists(cursor):
+            print("❌ Таблица замыкания не построена: python main.py rebuild-closure")
+            return
+
+        depth = get_depth(cursor, employee_id)
+        if depth is None:
+            print(f"❌ Сотрудник {employee_id} не найден")
+            return
+
+        if is_subordinate(cursor, employee_id, manager_id):
+            print(f"✅ Сотрудник {employee_id} подчинен руководителю {manager_id}")
+        else:
+            print(f"❌ Сотрудник {employee_id} не подчинен руководителю {manager_id}")
+        print(f"Глубина сотрудника {employee_id} в иерархии: {depth}")
+        print(f"Подчиненных у {manager_id}: {count_reports(cursor, manager_id)}")
+
+    except Exception as e:
+        print(f"❌ Ошибка при получении данных: {e}")
+    finally:
+        release_connection(conn)
+
+
+def rebuild_employee_closure(max_depth=MAX_DEPTH):
+    """Перестраивает таблицу замыкания иерархии employee_closure"""
+    conn = get_connection()
+    if not conn:
+        return
+
+    try:
+        started = time.perf_counter()
+        rows = rebuild_closure(conn.cursor(), max_depth)
+        conn.commit()
+        print(f"✅ Таблица employee_closure построена ({rows} связей) "
+              f"за {time.perf_counter() - started:.1f} с")
+
+    except Exception as e:
+        print(f"❌ Ошибка при построении таблицы замыкания: {e}")
+        conn.rollback()
+    finally:
+        release_connection(conn)
 
 
 def generate_hierarchy_positions():
@@ -203,6 +637,7 @@ def create_positions_table(conn):
         cursor = conn.cursor()
 
         # Очищаем таблицы если они существуют
+        cursor.execute("DROP TABLE IF EXISTS employee_closure")
         cursor.execute("DROP TABLE IF EXISTS employees CASCADE")
         cursor.execute("DROP TABLE IF EXISTS positions CASCADE")
 
@@ -232,26 +667,72 @@ def create_positions_table(conn):
         return None
 
 
-def create_employees_table(conn):
-    """Создает таблицу employees"""
+def create_employees_table(conn, with_constraints=True, partitioning=None):
+    """Создает таблицу employees
+
+    При with_constraints=False таблица создается без первичного ключа и
+    внешних ключей - их добавляет add_employees_constraints() после загрузки.
+
+    partitioning - схема секционирования из partitions.PARTITION_SCHEMES
+    ("position" или "hire_date"); None - обычная таблица.
+    """
     try:
         cursor = conn.cursor()
 
-        cursor.execute("""
-            CREATE TABLE employees (
-                id SERIAL PRIMARY KEY,
-                first_name VARCHAR(100) NOT NULL,
-                last_name VARCHAR(100) NOT NULL,
-                middle_name VARCHAR(100),
-                position_id INTEGER REFERENCES positions(id),
-                hire_date DATE NOT NULL,
-                salary INTEGER NOT NULL,
-                manager_id INTEGER REFERENCES employees(id)
-            )
-        """)
+        if partitioning:
+            method, column = PARTITION_SCHEMES[partitioning]
+            position_ref = ""
+            primary_key = ""
+            if with_constraints:
+                position_ref = " REFERENCES positions(id)"
+                # Ключ секционирования входит в первичный ключ, внешнего
+                # ключа manager_id нет - см. partitions.py
+                primary_key = f",\n                    PRIMARY KEY (id, {column})"
+            cursor.execute(f"""
+                CREATE TABLE employees (
+                    id SERIAL,
+                    first_name VARCHAR(100) NOT NULL,
+                    last_name VARCHAR(100) NOT NULL,
+                    middle_name VARCHAR(100),
+                    position_id INTEGER{position_ref},
+                    hire_date DATE NOT NULL,
+                    salary INTEGER NOT NULL,
+                    manager_id INTEGER{primary_key}
+                ) PARTITION BY {method} ({column})
+            """)
+            partitions = create_partitions(cursor, partitioning)
+        elif with_constraints:
+            cursor.execute("""
+                CREATE TABLE employees (
+                    id SERIAL PRIMARY KEY,
+                    first_name VARCHAR(100) NOT NULL,
+                    last_name VARCHAR(100) NOT NULL,
+                    middle_name VARCHAR(100),
+                    position_id INTEGER REFERENCES positions(id),
+                    hire_date DATE NOT NULL,
+                    salary INTEGER NOT NULL,
+                    manager_id INTEGER REFERENCES employees(id)
+                )
+            """)
+        else:
+            cursor.execute("""
+                CREATE TABLE employees (
+                    id SERIAL,
+                    first_name VARCHAR(100) NOT NULL,
+                    last_name VARCHAR(100) NOT NULL,
+                    middle_name VARCHAR(100),
+                    position_id INTEGER,
+                    hire_date DATE NOT NULL,
+                    salary INTEGER NOT NULL,
+                    manager_id INTEGER
+                )
+            """)
 
         conn.commit()
-        print("✅ Таблица employees создана")
+        if partitioning:
+            print(f"✅ Таблица employees создана: {len(partitions)} секций по {column}")
+        else:
+            print("✅ Таблица employees создана")
         return True
 
     except Exception as e:
@@ -260,45 +741,187 @@ def create_employees_table(conn):
         return False
 
 
-def generate_employees_data(num_employees=50000):
-    """Генерирует тестовые данные для 50,000 сотрудников"""
-    conn = connect_to_db()
-    if not conn:
+def add_employees_constraints(conn, partitioning=None):
+    """Добавляет первичный и внешние ключи после массовой загрузки
+
+    Для секционированной таблицы первичный ключ - (id, ключ секционирования),
+    внешнего ключа manager_id нет.
+    """
+    cursor = conn.cursor()
+    key = "id"
+    if partitioning:
+        key += ", " + PARTITION_SCHEMES[partitioning][1]
+    cursor.execute(f"ALTER TABLE employees ADD CONSTRAINT employees_pkey PRIMARY KEY ({key})")
+    cursor.execute("""
+        ALTER TABLE employees
+        ADD CONSTRAINT employees_position_id_fkey
+        FOREIGN KEY (position_id) REFERENCES positions(id)
+    """)
+    if partitioning:
+        print("✅ Первичный ключ и внешний ключ должности созданы")
         return
+    cursor.execute("""
+        ALTER TABLE employees
+        ADD CONSTRAINT employees_manager_id_fkey
+        FOREIGN KEY (manager_id) REFERENCES employees(id)
+    """)
+    print("✅ Первичный и внешние ключи созданы")
+
+
+# Индексы под запросы списка сотрудников: фильтры по должности и зарплате,
+# сортировки с keyset-пагинацией (поле, id) и связь с руководителем.
+# Создаются после загрузки данных - см. create_indexes()
+INDEXES = (
+    ("positions_title_key", "CREATE UNIQUE INDEX positions_title_key ON positions (title)"),
+    ("employees_manager_id_idx", "CREATE INDEX employees_manager_id_idx ON employees (manager_id)"),
+    ("employees_position_id_salary_idx",
+     "CREATE INDEX employees_position_id_salary_idx ON employees (position_id, salary)"),
+    ("employees_salary_id_idx", "CREATE INDEX employees_salary_id_idx ON employees (salary, id)"),
+    ("employees_hire_date_id_idx", "CREATE INDEX employees_hire_date_id_idx ON employees (hire_date, id)"),
+    ("employees_last_name_id_idx", "CREATE INDEX employees_last_name_id_idx ON employees (last_name, id)"),
+    ("employees_first_name_id_idx",
+     "CREATE INDEX employees_first_name_id_idx ON employees (first_name, id)"),
+)
+
+
+# Индексы, лишние при секционировании: в секции должности position_id
+# постоянен, и (position_id, salary) повторяет employees_salary_id_idx
+PARTITION_SKIP_INDEXES = {
+    "position": ("employees_position_id_salary_idx",),
+}
+
+
+def create_indexes(conn, partitioning=None):
+    """Создает индексы из INDEXES и обновляет статистику планировщика
+
+    Индексы секционированной таблицы создаются на родительской таблице,
+    PostgreSQL строит их в каждой секции.
+    """
+    cursor = conn.cursor()
+    skip = PARTITION_SKIP_INDEXES.get(partitioning, ())
+    created = 0
+    for name, ddl in INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+        if name in skip:
+            continue
+        cursor.execute(ddl)
+        created += 1
+    cursor.execute("ANALYZE positions")
+    cursor.execute("ANALYZE employees")
+    print(f"✅ Индексы созданы ({created})")
+
+
+def create_version_triggers(conn):
+    """Счетчики изменений positions и employees в таблице table_versions
+
+    Триггер уровня оператора увеличивает версию при любой записи (один
+    UPDATE на оператор, а не на строку), так что COPY и пакетные вставки
+    почти не замедляются. Версии читает cache.sync_table_versions.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = TG_TABLE_NAME;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table in ("positions", "employees"):
+        # Таблица пересоздана - это тоже новая версия
+        cursor.execute("""
+            INSERT INTO table_versions (name, version) VALUES (%s, 1)
+            ON CONFLICT (name) DO UPDATE SET version = table_versions.version + 1
+        """, (table,))
+        cursor.execute(f"DROP TRIGGER IF EXISTS {table}_version ON {table}")
+        cursor.execute(f"""
+            CREATE TRIGGER {table}_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE PROCEDURE bump_table_version()
+        """)
 
-    try:
-        # Создаем таблицы
-        positions = create_positions_table(conn)
-        if not positions:
-            return
-
-        if not create_employees_table(conn):
-            return
-
-        cursor = conn.cursor()
-
-        print("\n🔄 Создание иерархии сотрудников...")
 
-        # 1. Создаем CEO (верхний уровень)
-        print("👉 Создаем CEO...")
+EMPLOYEE_COLUMNS = (
+    "first_name", "last_name", "middle_name", "position_id",
+    "hire_date", "salary", "manager_id"
+)
+
+
+def _copy_value(value):
+    """Форматирует значение для текстового формата COPY"""
+    if value is None:
+        return "\\N"
+    return (str(value)
+            .replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r"))
+
+
+def copy_employees(cursor, rows, columns=EMPLOYEE_COLUMNS, table="employees"):
+    """Загружает строки в таблицу через COPY FROM STDIN из буфера в памяти"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN",
+        buffer
+    )
+
+
+def insert_management_returning(cursor):
+    """Создает руководящие уровни построчно через INSERT ... RETURNING id
+
+    Возвращает списки id менеджеров проектов и тимлидов.
+    """
+    # 1. Создаем CEO (верхний уровень)
+    print("👉 Создаем CEO...")
+    cursor.execute("""
+        INSERT INTO employees 
+        (first_name, last_name, position_id, hire_date, salary)
+        VALUES (%s, %s, %s, %s, %s)
+        RETURNING id
+    """, (
+        person.first_name(gender=Gender.MALE),
+        person.last_name(gender=Gender.MALE),
+        1,  # ID CEO
+        dt.date(start=2010, end=2012),
+        500000
+    ))
+    ceo_id = cursor.fetchone()[0]
+
+    # 2. Создаем директоров департаментов (подчиняются CEO)
+    print("👉 Создаем директоров департаментов...")
+    directors = []
+    for _ in range(5):
         cursor.execute("""
             INSERT INTO employees 
-            (first_name, last_name, position_id, hire_date, salary)
-            VALUES (%s, %s, %s, %s, %s)
+            (first_name, last_name, position_id, hire_date, salary, manager_id)
+            VALUES (%s, %s, %s, %s, %s, %s)
             RETURNING id
         """, (
-            person.first_name(gender=Gender.MALE),
-            person.last_name(gender=Gender.MALE),
-            1,  # ID CEO
-            dt.date(start=2010, end=2012),
-            500000
+            person.first_name(),
+            person.last_name(),
+            2,  # ID директора
+            dt.date(start=2012, end=2014),
+            random.randint(200000, 300000),
+            ceo_id
         ))
-        ceo_id = cursor.fetchone()[0]
+        directors.append(cursor.fetchone()[0])
 
-        # 2. Создаем директоров департаментов (подчиняются CEO)
-        print("👉 Создаем директоров департаментов...")
-        directors = []
-        for _ in range(5):
+    # 3. Создаем менеджеров проектов (подчиняются директорам)
+    print("👉 Создаем менеджеров проектов...")
+    managers = []
+    for director_id in directors:
+        for _ in range(random.randint(2, 4)):
             cursor.execute("""
                 INSERT INTO employees 
                 (first_name, last_name, position_id, hire_date, salary, manager_id)
@@ -307,117 +930,494 @@ def generate_employees_data(num_employees=50000):
             """, (
                 person.first_name(),
                 person.last_name(),
-                2,  # ID директора
-                dt.date(start=2012, end=2014),
-                random.randint(200000, 300000),
-                ceo_id
+                3,  # ID менеджера проекта
+                dt.date(start=2014, end=2016),
+                random.randint(150000, 200000),
+                director_id
             ))
-            directors.append(cursor.fetchone()[0])
-
-        # 3. Создаем менеджеров проектов (подчиняются директорам)
-        print("👉 Создаем менеджеров проектов...")
-        managers = []
-        for director_id in directors:
-            for _ in range(random.randint(2, 4)):
-                cursor.execute("""
-                    INSERT INTO employees 
-                    (first_name, last_name, position_id, hire_date, salary, manager_id)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                """, (
-                    person.first_name(),
-                    person.last_name(),
-                    3,  # ID менеджера проекта
-                    dt.date(start=2014, end=2016),
-                    random.randint(150000, 200000),
-                    director_id
-                ))
-                managers.append(cursor.fetchone()[0])
-
-        # 4. Создаем тимлидов (подчиняются менеджерам проектов)
-        print("👉 Создаем тимлидов...")
-        team_leads = []
-        for manager_id in managers:
-            for _ in range(random.randint(2, 3)):
-                cursor.execute("""
-                    INSERT INTO employees 
-                    (first_name, last_name, position_id, hire_date, salary, manager_id)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                """, (
-                    person.first_name(),
-                    person.last_name(),
-                    4,  # ID тимлида
-                    dt.date(start=2016, end=2018),
-                    random.randint(100000, 150000),
-                    manager_id
-                ))
-                team_leads.append(cursor.fetchone()[0])
+            managers.append(cursor.fetchone()[0])
+
+    # 4. Создаем тимлидов (подчиняются менеджерам проектов)
+    print("👉 Создаем тимлидов...")
+    team_leads = []
+    for manager_id in managers:
+        for _ in range(random.randint(2, 3)):
+            cursor.execute("""
+                INSERT INTO employees 
+                (first_name, last_name, position_id, hire_date, salary, manager_id)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING id
+            """, (
+                person.first_name(),
+                person.last_name(),
+                4,  # ID тимлида
+                dt.date(start=2016, end=2018),
+                random.randint(100000, 150000),
+                manager_id
+            ))
+            team_leads.append(cursor.fetchone()[0])
+
+    return managers, team_leads
+
+
+def build_management_tree(rng=random):
+    """Строит руководящие уровни иерархии в памяти с id на стороне клиента
+
+    Возвращает список уровней (каждый уровень - словарь столбцов),
+    списки id менеджеров проектов и тимлидов.
+    """
+    levels = []
+    next_id = 1
+
+    def new_level():
+        level = {
+            "id": array('i'),
+            "first_name": [],
+            "last_name": [],
+            "middle_name": [],
+            "position_id": array('i'),
+            "hire_date": [],
+            "salary": array('i'),
+            "manager_id": [],
+        }
+        levels.append(level)
+        return level
+
+    def add(level, first_name, last_name, position_id, hire_date, salary, manager_id):
+        nonlocal next_id
+        employee_id = next_id
+        next_id += 1
+        level["id"].append(employee_id)
+        level["first_name"].append(first_name)
+        level["last_name"].append(last_name)
+        level["middle_name"].append(None)
+        level["position_id"].append(position_id)
+        level["hire_date"].append(hire_date)
+        level["salary"].append(salary)
+        level["manager_id"].append(manager_id)
+        return employee_id
+
+    # 1. CEO (верхний уровень)
+    ceo_id = add(
+        new_level(),
+        person.first_name(gender=Gender.MALE),
+        person.last_name(gender=Gender.MALE),
+        1,  # ID CEO
+        dt.date(start=2010, end=2012),
+        500000,
+        None
+    )
+
+    # 2. Директора департаментов (подчиняются CEO)
+    level = new_level()
+    directors = [
+        add(level, person.first_name(), person.last_name(), 2,
+            dt.date(start=2012, end=2014), rng.randint(200000, 300000), ceo_id)
+        for _ in range(5)
+    ]
+
+    # 3. Менеджеры проектов (подчиняются директорам)
+    level = new_level()
+    managers = [
+        add(level, person.first_name(), person.last_name(), 3,
+            dt.date(start=2014, end=2016), rng.randint(150000, 200000), director_id)
+        for director_id in directors
+        for _ in range(rng.randint(2, 4))
+    ]
+
+    # 4. Тимлиды (подчиняются менеджерам проектов)
+    level = new_level()
+    team_leads = [
+        add(level, person.first_name(), person.last_name(), 4,
+            dt.date(start=2016, end=2018), rng.randint(100000, 150000), manager_id)
+        for manager_id in managers
+        for _ in range(rng.randint(2, 3))
+    ]
+
+    return levels, managers, team_leads
+
+
+def _level_rows(level):
+    """Собирает строки уровня из столбцов в порядке ("id",) + EMPLOYEE_COLUMNS"""
+    return zip(*(level[column] for column in ("id",) + EMPLOYEE_COLUMNS))
+
+
+def insert_management_client(cursor, bulk=True, rng=random):
+    """Записывает руководящие уровни, построенные в памяти
+
+    При bulk=True все уровни уходят одним COPY, иначе - одним
+    INSERT ... VALUES на уровень. После записи синхронизирует
+    последовательность employees_id_seq.
+    """
+    print("👉 Строим руководящие уровни в памяти...")
+    levels, managers, team_leads = build_management_tree(rng)
+
+    columns = ("id",) + EMPLOYEE_COLUMNS
+    if bulk:
+        copy_employees(
+            cursor,
+            (row for level in levels for row in _level_rows(level)),
+            columns=columns
+        )
+    else:
+        for level in levels:
+            rows = list(_level_rows(level))
+            psycopg2.extras.execute_values(
+                cursor,
+                f"INSERT INTO employees ({', '.join(columns)}) VALUES %s",
+                rows,
+                page_size=len(rows)
+            )
+
+    resync_employees_id_seq(cursor)
+    total = sum(len(level["id"]) for level in levels)
+    print(f"✅ Руководящие уровни записаны ({total} сотрудников)")
+    return managers, team_leads
+
+
+def resync_employees_id_seq(cursor):
+    """Сдвигает employees_id_seq за максимальный id после вставки с явными id"""
+    cursor.execute("""
+        SELECT setval(pg_get_serial_sequence('employees', 'id'),
+                      COALESCE(MAX(id), 0) + 1, false)
+        FROM employees
+    """)
+
+
+# Должности рядовых сотрудников: (ID, вес, диапазон зарплаты)
+# 80% - junior (ID 6-9), 20% - middle (ID 5, 10)
+LEAF_POSITIONS = (
+    (6, 20, (40000, 80000)),
+    (7, 20, (40000, 80000)),
+    (8, 20, (40000, 80000)),
+    (9, 20, (40000, 80000)),
+    (5, 10, (80000, 120000)),
+    (10, 10, (80000, 120000)),
+)
+LEAF_HIRE_DATES = range(date(2018, 1, 1).toordinal(), date(2023, 12, 31).toordinal() + 1)
+
+
+def generate_leaf_batch(size, manager_pool, rng=random, names=None):
+    """Генерирует пакет рядовых сотрудников
+
+    Должности, зарплаты, менеджеры и даты приема выбираются сразу для
+    всего пакета через rng.choices(k=size). Если переданы пулы имен
+    (name_pool.NamePools), имена тоже выбираются по индексу без обращения
+    к Mimesis. Возвращает список строк в порядке EMPLOYEE_COLUMNS.
+    """
+    leaf_positions = rng.choices(
+        LEAF_POSITIONS,
+        weights=[weight for _, weight, _ in LEAF_POSITIONS],
+        k=size
+    )
+    position_ids = [position_id for position_id, _, _ in leaf_positions]
+    salaries = [rng.randint(low, high) for _, _, (low, high) in leaf_positions]
+    manager_ids = rng.choices(manager_pool, k=size)
+    hire_dates = [date.fromordinal(day) for day in rng.choices(LEAF_HIRE_DATES, k=size)]
+
+    if names is not None:
+        first_names = rng.choices(names.first, k=size)
+        last_names = rng.choices(names.last, k=size)
+        middle_names = [
+            middle if rng.random() > 0.3 else None  # Отчество
+            for middle in rng.choices(names.middle, k=size)
+        ]
+    else:
+        first_names = [person.first_name() for _ in range(size)]
+        last_names = [person.last_name() for _ in range(size)]
+        middle_names = [
+            person.last_name() if rng.random() > 0.3 else None  # Отчество
+            for _ in range(size)
+        ]
+
+    return list(zip(first_names, last_names, middle_names, position_ids,
+                    hire_dates, salaries, manager_ids))
+
+
+# Столбцы параллельной загрузки: id назначает генератор, а не последовательность
+SHARD_COLUMNS = EMPLOYEE_COLUMNS + ("id",)
+
+
+def create_staging_table(conn):
+    """Создает нелогируемую таблицу employees_staging для параллельной загрузки"""
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS employees_staging")
+    cursor.execute(f"""
+        CREATE UNLOGGED TABLE employees_staging AS
+        SELECT {', '.join(SHARD_COLUMNS)} FROM employees WITH NO DATA
+    """)
+    conn.commit()
+
+
+def merge_staging_table(cursor):
+    """Переносит строки из employees_staging в employees и удаляет staging"""
+    columns = ', '.join(SHARD_COLUMNS)
+    cursor.execute(f"""
+        INSERT INTO employees ({columns})
+        SELECT {columns} FROM employees_staging
+        ORDER BY id
+    """)
+    cursor.execute("DROP TABLE employees_staging")
+
+
+# Соединение процесса-воркера параллельной генерации
+_worker_conn = None
+
+
+def _init_generation_worker():
+    """Открывает собственное соединение в каждом процессе-воркере"""
+    global _worker_conn
+    _worker_conn = connect_to_db()
+
+
+def copy_to_partitions(cursor, rows, partitioning, partitions, columns=EMPLOYEE_COLUMNS):
+    """Загружает строки через COPY прямо в секции employees
+
+    Строки раскладываются по секциям на клиенте, и сервер не маршрутизирует
+    каждую строку через родительскую таблицу. columns начинаются с
+    EMPLOYEE_COLUMNS (ключ секции ищется по их порядку).
+    """
+    for name, partition_rows in route_rows(partitioning, rows, partitions).items():
+        copy_employees(cursor, partition_rows, columns, table=name)
+
+
+def _generate_leaf_shard(task):
+    """Генерирует часть рядовых сотрудников и загружает её в employees_staging
+
+    Для секционированной таблицы часть загружается сразу в секции - воркеры
+    пишут в секции параллельно, без переноса из staging.
+
+    Провайдеры Mimesis и rng пересеиваются для каждой части, а id строк
+    идут подряд с first_id части, поэтому результат (вместе с id) не
+    зависит от того, какой воркер обработал часть и в каком порядке.
+    """
+    (shard, first_id, size, manager_pool, seed, use_name_pools, name_pool_size, partitioning,
+     partitions) = task
+    shard_seed = None if seed is None else seed + shard + 1
+    person.reseed(shard_seed)
+    dt.reseed(shard_seed)
+    rng = random.Random(shard_seed)
+    names = load_name_pools(seed=seed, size=name_pool_size) if use_name_pools else None
+
+    employees_batch = [
+        row + (employee_id,)
+        for employee_id, row in enumerate(generate_leaf_batch(size, manager_pool, rng, names),
+                                          first_id)
+    ]
+    cursor = _worker_conn.cursor()
+    cursor.execute("SET synchronous_commit TO off")
+    if partitioning:
+        copy_to_partitions(cursor, employees_batch, partitioning, partitions, SHARD_COLUMNS)
+    else:
+        copy_employees(cursor, employees_batch, SHARD_COLUMNS, table="employees_staging")
+    _worker_conn.commit()
+    return len(employees_batch)
+
+
+def generate_leaves_parallel(num_employees, manager_pool, workers, batch_size, seed=None,
+                             use_name_pools=True, partitioning=None, partitions=(),
+                             name_pool_size=DEFAULT_POOL_SIZE, first_id=1):
+    """Шардирует генерацию рядовых сотрудников по пулу процессов
+
+    Сотрудники получают id first_id, first_id + 1, ... по порядку частей.
+    partitioning и partitions - схема и секции секционированной таблицы:
+    воркеры загружают строки прямо в секции, иначе - в employees_staging.
+    """
+    tasks = [
+        (shard, first_id + start, min(batch_size, num_employees - start), manager_pool, seed,
+         use_name_pools, name_pool_size, partitioning, partitions)
+        for shard, start in enumerate(range(0, num_employees, batch_size))
+    ]
+    target = "секции" if partitioning else "staging"
+    done = 0
+    with multiprocessing.Pool(workers, initializer=_init_generation_worker) as pool:
+        for count in pool.imap_unordered(_generate_leaf_shard, tasks):
+            done += count
+            print(f"✅ Загружено в {target}: {done}/{num_employees}")
+
+
+def generate_employees_data(num_employees=50000, method="copy", hierarchy="client", seed=None,
+                            workers=1, use_name_pools=True, build_closure=False, partitioning=None,
+                            name_pool_size=DEFAULT_POOL_SIZE):
+    """Генерирует тестовые данные для 50,000 сотрудников
+
+    method="copy" - загрузка через COPY FROM STDIN одной транзакцией,
+    ключи создаются после загрузки;
+    method="executemany" - прежняя загрузка пакетами по 1000 строк.
+
+    hierarchy="client" - id руководителей назначаются на стороне клиента,
+    уровни пишутся массово без обращений к БД на каждую строку;
+    hierarchy="returning" - прежняя построчная вставка с RETURNING id.
+
+    seed - зерно генераторов для воспроизводимых данных.
+
+    workers > 1 - рядовые сотрудники генерируются пулом процессов, каждый
+    со своим соединением, через таблицу employees_staging (только для
+    method="copy").
+
+    use_name_pools - имена рядовых сотрудников выбираются из пулов на диске
+    (см. name_pool.py) вместо вызовов Mimesis на каждую строку;
+    name_pool_size - число значений в каждом пуле.
+
+    build_closure - после загрузки построить таблицу замыкания иерархии
+    employee_closure (см. hierarchy.py).
+
+    partitioning - создать employees секционированной ("position" или
+    "hire_date", см. partitions.py). Рядовые сотрудники загружаются
+    прямо в секции, при workers > 1 - параллельно из нескольких процессов;
+    воркеры фиксируют свои строки сами, поэтому при ошибке генерации
+    employees очищается (TRUNCATE).
+    """
+    if method not in ("copy", "executemany"):
+        print(f"❌ Неизвестный способ загрузки: {method}")
+        return
+
+    if hierarchy not in ("client", "returning"):
+        print(f"❌ Неизвестный способ построения иерархии: {hierarchy}")
+        return
+
+    if partitioning and partitioning not in PARTITION_SCHEMES:
+        print(f"❌ Неизвестная схема секционирования: {partitioning}")
+        return
+
+    if workers > 1 and method != "copy":
+        print("❌ Параллельная генерация поддерживается только для method='copy'")
+        return
+
+    conn = get_connection()
+    if not conn:
+        return
+
+    try:
+        started = time.perf_counter()
+        bulk = method == "copy"
+
+        rng = random.Random(seed)
+        if seed is not None:
+            person.reseed(seed)
+            dt.reseed(seed)
+
+        # Создаем таблицы
+        positions = create_positions_table(conn)
+        if not positions:
+            return
+
+        if not create_employees_table(conn, with_constraints=not bulk, partitioning=partitioning):
+            return
+
+        if workers > 1 and not partitioning:
+            create_staging_table(conn)
+
+        cursor = conn.cursor()
+        partitions = employee_partitions(cursor) if partitioning else []
+
+        print("\n🔄 Создание иерархии сотрудников...")
+
+        if hierarchy == "client":
+            managers, team_leads = insert_management_client(cursor, bulk, rng)
+        else:
+            managers, team_leads = insert_management_returning(cursor)
 
         # 5. Создаем рядовых сотрудников (50,000)
         print(f"👉 Создаем {num_employees} рядовых сотрудников...")
-        batch_size = 1000
-        num_batches = num_employees // batch_size
-
-        junior_positions = [6, 7, 8, 9]  # ID младших позиций
-        middle_positions = [5, 10]  # ID средних позиций
-
-        for batch in range(num_batches):
-            employees_batch = []
-            for _ in range(batch_size):
-                # 80% - junior, 20% - middle
-                if random.random() < 0.8:
-                    position_id = random.choice(junior_positions)
-                    salary = random.randint(40000, 80000)
+        batch_size = 50000 if bulk else 1000
+        num_batches = (num_employees + batch_size - 1) // batch_size
+
+        # Менеджеры рядовых сотрудников - тимлиды и менеджеры проектов
+        manager_pool = team_leads + managers
+        names = load_name_pools(seed=seed, size=name_pool_size) if use_name_pools else None
+
+        if workers > 1:
+            # id рядовых сотрудников назначаются по частям, а не по порядку
+            # завершения воркеров - при том же seed те же строки получают те же id
+            cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM employees")
+            first_id = cursor.fetchone()[0]
+            generate_leaves_parallel(num_employees, manager_pool, workers, batch_size, seed,
+                                     use_name_pools, partitioning, partitions, name_pool_size,
+                                     first_id)
+            if not partitioning:
+                merge_staging_table(cursor)
+                print(f"✅ Данные из {workers} процессов перенесены в employees")
+            resync_employees_id_seq(cursor)
+        else:
+            for batch in range(num_batches):
+                employees_batch = generate_leaf_batch(
+                    min(batch_size, num_employees - batch * batch_size),
+                    manager_pool,
+                    rng,
+                    names
+                )
+
+                if bulk and partitioning:
+                    copy_to_partitions(cursor, employees_batch, partitioning, partitions)
+                elif bulk:
+                    copy_employees(cursor, employees_batch)
                 else:
-                    position_id = random.choice(middle_positions)
-                    salary = random.randint(80000, 120000)
-
-                # Выбираем случайного менеджера (тимлида или менеджера)
-                manager_pool = team_leads + managers
-                manager_id = random.choice(manager_pool)
-
-                employees_batch.append((
-                    person.first_name(),
-                    person.last_name(),
-                    person.last_name() if random.random() > 0.3 else None,  # Отчество
-                    position_id,
-                    dt.date(start=2018, end=2023),
-                    salary,
-                    manager_id
-                ))
-
-            cursor.executemany("""
-                INSERT INTO employees 
-                (first_name, last_name, middle_name, position_id, hire_date, salary, manager_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, employees_batch)
-
-            conn.commit()
-            print(f"✅ Пакет {batch + 1}/{num_batches} ({len(employees_batch)} сотрудников) добавлен")
+                    cursor.executemany("""
+                        INSERT INTO employees 
+                        (first_name, last_name, middle_name, position_id, hire_date, salary, manager_id)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """, employees_batch)
+                    conn.commit()
+                print(f"✅ Пакет {batch + 1}/{num_batches} ({len(employees_batch)} сотрудников) добавлен")
+
+        if bulk:
+            add_employees_constraints(conn, partitioning)
+        create_indexes(conn, partitioning)
+        # Поиск по ФИО необязателен: без прав на CREATE EXTENSION генерация продолжается
+        cursor.execute("SAVEPOINT search_index")
+        try:
+            if not create_search_index(cursor):
+                print("⚠️ pg_trgm не выделяет триграммы из кириллицы - поиск по ФИО не будет работать")
+            print("✅ Индекс поиска по ФИО создан")
+        except psycopg2.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT search_index")
+            print(f"⚠️ Индекс поиска по ФИО не создан: {e}")
+        create_version_triggers(conn)
+        if build_closure:
+            rows = rebuild_closure(cursor)
+            print(f"✅ Таблица employee_closure построена ({rows} связей)")
+        conn.commit()
 
+        elapsed = time.perf_counter() - started
         print(f"\n🎉 Успешно сгенерировано {num_employees} сотрудников с 5 уровнями иерархии!")
+        print(f"⏱ Время генерации ({method}): {elapsed:.1f} с")
 
     except Exception as e:
         print(f"❌ Ошибка при генерации данных: {e}")
         conn.rollback()
+        if partitioning and workers > 1:
+            # Воркеры фиксируют свои секции отдельно от основной транзакции
+            try:
+                conn.cursor().execute("TRUNCATE employees")
+                conn.commit()
+                print("⚠️ Частично загруженные секции employees очищены")
+            except psycopg2.Error as e:
+                conn.rollback()
+                print(f"❌ Не удалось очистить employees: {e}")
     finally:
-        conn.close()
+        # Таблицы пересоздаются даже при неудачной генерации
+        invalidate_all()
+        release_connection(conn)
 
 
 def main_menu():
     while True:
+        # Номера пунктов не меняются: новые пункты добавляются в конец
         print("\nГлавное меню:")
         print("1. Показать список сотрудников")
         print("2. Добавить сотрудника")
         print("3. Показать список должностей")
         print("4. Сгенерировать тестовые данные (50,000 сотрудников)")
         print("5. Выход")
+        print("6. Иерархия сотрудников")
+        print("7. Статистика пула, кэша и SQL-запросов")
+        print("8. Найти сотрудника по ФИО")
 
-        choice = input("Выберите действие (1-5): ")
+        choice = input("Выберите действие (1-8): ")
 
         if choice == "1":
-            show_employees()
+            browse_employees()
         elif choice == "2":
             add_employee()
         elif choice == "3":
@@ -429,9 +1429,166 @@ def main_menu():
         elif choice == "5":
             print("Выход из программы")
             break
+        elif choice == "6":
+            hierarchy_menu()
+        elif choice == "7":
+            print_pool_stats()
+            print_cache_stats()
+            print_query_stats()
+        elif choice == "8":
+            show_search(input("ФИО или его часть: "), interactive=True)
         else:
             print("❌ Неверный ввод, попробуйте снова")
 
 
+def add_filter_arguments(parser):
+    """Фильтры и сортировка списка сотрудников (как в show_employees)"""
+    parser.add_argument("--position", dest="position_filter", default=None)
+    parser.add_argument("--level", dest="level_filter", default=None)
+    parser.add_argument("--salary-min", type=int, default=None)
+    parser.add_argument("--salary-max", type=int, default=None)
+    parser.add_argument("--sort", dest="sort_field", choices=sorted(SORT_FIELDS), default="id")
+    parser.add_argument("--order", dest="sort_order", choices=["asc", "desc"], default="asc")
+
+
+def filters_from_args(args):
+    return args.position_filter, args.level_filter, args.salary_min, args.salary_max
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Система управления сотрудниками")
+    subparsers = parser.add_subparsers(dest="command")
+
+    list_ = subparsers.add_parser("list", help="список сотрудников")
+    list_.add_argument("--limit", type=int, default=None,
+                       help=f"по умолчанию {PAGE_SIZE}, с --all - без ограничения")
+    list_.add_argument("--all", dest="stream", action="store_true",
+                       help="вывести все строки потоком, без загрузки в память")
+    list_.add_argument("--widths", choices=["sample", "schema"], default="sample",
+                       help="ширина столбцов при --all: по первым строкам или по схеме")
+    list_.add_argument("--no-stats", dest="stats", action="store_false",
+                       help="не считать статистику зарплат по выборке после списка")
+    add_filter_arguments(list_)
+
+    add = subparsers.add_parser("add", help="добавить сотрудника")
+    add.add_argument("--first-name", required=True)
+    add.add_argument("--last-name", required=True)
+    add.add_argument("--middle-name", default=None)
+    add.add_argument("--position-id", type=int, required=True)
+    add.add_argument("--hire-date", required=True, help="ГГГГ-ММ-ДД")
+    add.add_argument("--salary", type=int, required=True)
+    add.add_argument("--manager-id", type=int, default=None)
+
+    subparsers.add_parser("positions", help="список должностей")
+
+    search = subparsers.add_parser("search", help="поиск сотрудников по ФИО")
+    search.add_argument("query", help='ФИО или его часть, например "петров ив"')
+    search.add_argument("--limit", type=int, default=PAGE_SIZE)
+
+    sql_stats = subparsers.add_parser("sql-stats", help="сводка по SQL-запросам из журнала")
+    sql_stats.add_argument("--log", default=None, help="журнал JSON (по умолчанию SQL_LOG_FILE)")
+    sql_stats.add_argument("--prometheus", default=None, help="записать метрики Prometheus в файл")
+    sql_stats.add_argument("--limit", type=int, default=15)
+    sql_stats.add_argument("--plans", action="store_true", help="показать планы медленных запросов")
+
+    subparsers.add_parser("search-index", help="создать индекс поиска по ФИО для текущих данных")
+    subparsers.add_parser("version-triggers",
+                          help="создать триггеры версий таблиц (ETag и кэш API) для текущих данных")
+
+    generate = subparsers.add_parser("generate", help="сгенерировать тестовые данные")
+    generate.add_argument("--rows", type=int, default=50000, help="число рядовых сотрудников")
+    generate.add_argument("--method", choices=["copy", "executemany"], default="copy")
+    generate.add_argument("--hierarchy", choices=["client", "returning"], default="client")
+    generate.add_argument("--seed", type=int, default=None)
+    generate.add_argument("--workers", type=int, default=1, help="число процессов генерации")
+    generate.add_argument("--no-name-pools", dest="use_name_pools", action="store_false",
+                          help="генерировать имена через Mimesis на каждую строку")
+    generate.add_argument("--name-pool-size", type=int, default=DEFAULT_POOL_SIZE,
+                          help="число значений в каждом пуле имен")
+    generate.add_argument("--partition", choices=sorted(PARTITION_SCHEMES), default=None,
+                          help="секционировать employees по должности или году приема")
+    generate.add_argument("--closure", action="store_true",
+                          help="построить таблицу замыкания иерархии после загрузки")
+
+    subtree = subparsers.add_parser("subtree", help="подчиненные сотрудника")
+    subtree.add_argument("employee_id", type=int)
+    subtree.add_argument("--depth", type=int, default=MAX_DEPTH)
+    subtree.add_argument("--limit", type=int, default=PAGE_SIZE)
+
+    chain = subparsers.add_parser("chain", help="цепочка руководителей до CEO")
+    chain.add_argument("employee_id", type=int)
+    chain.add_argument("--depth", type=int, default=MAX_DEPTH)
+
+    rollup = subparsers.add_parser("rollup", help="численность и ФОТ по руководителям")
+    rollup.add_argument("--depth", type=int, default=MAX_DEPTH)
+    rollup.add_argument("--limit", type=int, default=PAGE_SIZE)
+
+    is_under = subparsers.add_parser("is-under", help="подчинен ли сотрудник руководителю")
+    is_under.add_argument("employee_id", type=int)
+    is_under.add_argument("manager_id", type=int)
+
+    import_ = subparsers.add_parser("import", help="импортировать сотрудников из CSV или JSONL")
+    import_.add_argument("path")
+    import_.add_argument("--format", dest="fmt", choices=["csv", "jsonl"], default=None,
+                         help="по умолчанию - по расширению файла")
+    import_.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+
+    export = subparsers.add_parser("export", help="выгрузить список сотрудников в файл")
+    export.add_argument("path")
+    export.add_argument("--format", dest="fmt", choices=EXPORT_FORMATS, default=None,
+                        help="по умолчанию - по расширению файла")
+    export.add_argument("--limit", type=int, default=None)
+    add_filter_arguments(export)
+
+    rebuild = subparsers.add_parser("rebuild-closure", help="перестроить таблицу замыкания иерархии")
+    rebuild.add_argument("--depth", type=int, default=MAX_DEPTH)
+
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    main_menu()
\ No newline at end of file
+    args = parse_args()
+    if args.command == "list":
+        limit = args.limit if args.limit or args.stream else PAGE_SIZE
+        try:
+            show_employees(*filters_from_args(args), args.sort_field, args.sort_order, limit,
+                           stream=args.stream, widths=args.widths, stats=args.stats)
+        except BrokenPipeError:
+            # Вывод передан в head/less и закрыт раньше конца таблицы
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    elif args.command == "add":
+        added = add_employee(args.first_name, args.last_name, args.position_id, args.hire_date,
+                             args.salary, args.middle_name, args.manager_id)
+        raise SystemExit(0 if added else 1)
+    elif args.command == "positions":
+        show_positions()
+    elif args.command == "search":
+        show_search(args.query, args.limit)
+    elif args.command == "sql-stats":
+        show_sql_stats(args.log, args.prometheus, args.limit, args.plans)
+    elif args.command == "search-index":
+        create_name_search_index()
+    elif args.command == "version-triggers":
+        install_version_triggers()
+    elif args.command == "generate":
+        generate_employees_data(args.rows, method=args.method, hierarchy=args.hierarchy,
+                                seed=args.seed, workers=args.workers,
+                                use_name_pools=args.use_name_pools, build_closure=args.closure,
+                                partitioning=args.partition, name_pool_size=args.name_pool_size)
+    elif args.command == "subtree":
+        show_subtree(args.employee_id, args.depth, args.limit)
+    elif args.command == "chain":
+        show_chain_of_command(args.employee_id, args.depth)
+    elif args.command == "rollup":
+        show_headcount_rollup(args.depth, args.limit)
+    elif args.command == "is-under":
+        show_is_subordinate(args.employee_id, args.manager_id)
+    elif args.command == "import":
+        import_employees(args.path, args.fmt, args.chunk_size)
+    elif args.command == "export":
+        export_employee_list(args.path, filters_from_args(args), args.sort_field, args.sort_order,
+                             args.limit, args.fmt)
+    elif args.command == "rebuild-closure":
+        rebuild_employee_closure(args.depth)
+    else:
+        main_menu()
\ No newline at end of file
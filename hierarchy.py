@@ -0,0 +1,246 @@
+"""Запросы к иерархии сотрудников (employees.manager_id)
+
+Каждая функция - один запрос WITH RECURSIVE, поэтому поддерево
+директора на десятки тысяч человек возвращается за одно обращение к БД.
+Глубина обхода ограничена max_depth: это и защита от циклов в
+manager_id, которые можно создать ручным добавлением сотрудников.
+"""
+
+# В сгенерированной организации 5 уровней, запас - для ручных изменений
+MAX_DEPTH = 20
+
+SUBTREE_HEADERS = ["ID", "Глубина", "Имя", "Фамилия", "Должность", "Уровень", "Зарплата", "ID менеджера"]
+CHAIN_HEADERS = ["ID", "Уровень подчинения", "Имя", "Фамилия", "Должность", "Уровень"]
+ROLLUP_HEADERS = ["ID", "Имя", "Фамилия", "Должность", "Прямых подчиненных", "Всего подчиненных",
+                  "ФОТ подчиненных", "Глубина"]
+
+
+# Тексты запросов общие для этого модуля и async_db
+SUBTREE_SQL = """
+    WITH RECURSIVE subtree AS (
+        SELECT id, 0 AS depth
+        FROM employees
+        WHERE id = %s
+        UNION ALL
+        SELECT e.id, s.depth + 1
+        FROM employees e
+        JOIN subtree s ON e.manager_id = s.id
+        WHERE s.depth < %s
+    )
+    SELECT e.id, s.depth, e.first_name, e.last_name, p.title, p.level, e.salary, e.manager_id
+    FROM subtree s
+    JOIN employees e ON e.id = s.id
+    LEFT JOIN positions p ON e.position_id = p.id
+    ORDER BY s.depth, e.id
+"""
+
+CHAIN_SQL = """
+    WITH RECURSIVE chain AS (
+        SELECT id, manager_id, 0 AS distance
+        FROM employees
+        WHERE id = %s
+        UNION ALL
+        SELECT e.id, e.manager_id, c.distance + 1
+        FROM employees e
+        JOIN chain c ON e.id = c.manager_id
+        WHERE c.distance < %s
+    )
+    SELECT e.id, c.distance, e.first_name, e.last_name, p.title, p.level
+    FROM chain c
+    JOIN employees e ON e.id = c.id
+    LEFT JOIN positions p ON e.position_id = p.id
+    ORDER BY c.distance
+"""
+
+ROLLUP_SQL = """
+    WITH RECURSIVE reports AS (
+        SELECT m.id AS manager_id, e.id, e.salary, 1 AS depth
+        FROM employees m
+        JOIN employees e ON e.manager_id = m.id
+        UNION ALL
+        SELECT r.manager_id, e.id, e.salary, r.depth + 1
+        FROM reports r
+        JOIN employees e ON e.manager_id = r.id
+        WHERE r.depth < %s
+    ),
+    rollup AS (
+        SELECT manager_id,
+               COUNT(*) FILTER (WHERE depth = 1) AS direct_reports,
+               COUNT(*) AS headcount,
+               SUM(salary) AS payroll,
+               MAX(depth) AS depth
+        FROM reports
+        GROUP BY manager_id
+    )
+    SELECT m.id, m.first_name, m.last_name, p.title,
+           r.direct_reports, r.headcount, r.payroll, r.depth
+    FROM rollup r
+    JOIN employees m ON m.id = r.manager_id
+    LEFT JOIN positions p ON m.position_id = p.id
+    ORDER BY r.headcount DESC, m.id
+"""
+
+
+def get_subtree(cursor, employee_id, max_depth=MAX_DEPTH, limit=None):
+    """Сотрудник и все его подчиненные до глубины max_depth
+
+    Строки упорядочены по глубине, затем по id.
+    """
+    sql = SUBTREE_SQL
+    params = [employee_id, max_depth]
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+
+def get_chain_of_command(cursor, employee_id, max_depth=MAX_DEPTH):
+    """Цепочка руководителей от сотрудника (уровень 0) вверх до CEO"""
+    cursor.execute(CHAIN_SQL, (employee_id, max_depth))
+    return cursor.fetchall()
+
+
+def get_headcount_rollup(cursor, max_depth=MAX_DEPTH, limit=None):
+    """Численность и ФОТ всех подчиненных (рекурсивно) для каждого руководителя
+
+    Обход начинается только от сотрудников, у которых есть подчиненные.
+    Строки упорядочены по убыванию общей численности.
+    """
+    sql = ROLLUP_SQL
+    params = [max_depth]
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+
+# --- Таблица замыкания иерархии ---
+#
+# employee_closure хранит все пары (руководитель, подчиненный) на любой
+# глубине, включая пару (id, id, 0). Проверки "X подчинен Y", "все
+# подчиненные Y" и "глубина X" становятся поиском по индексу. Таблица
+# необязательна: rebuild_closure() строит её целиком после генерации,
+# add_to_closure() поддерживает при добавлении сотрудника.
+
+CLOSURE_EXISTS_SQL = "SELECT to_regclass('employee_closure') IS NOT NULL"
+
+
+def closure_exists(cursor):
+    cursor.execute(CLOSURE_EXISTS_SQL)
+    return cursor.fetchone()[0]
+
+
+def rebuild_closure(cursor, max_depth=MAX_DEPTH):
+    """Пересоздает employee_closure одним INSERT ... WITH RECURSIVE
+
+    Ключи и индексы создаются после загрузки. Возвращает число строк.
+    """
+    cursor.execute("DROP TABLE IF EXISTS employee_closure")
+    cursor.execute("""
+        CREATE TABLE employee_closure (
+            ancestor INTEGER NOT NULL,
+            descendant INTEGER NOT NULL,
+            depth INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO employee_closure (ancestor, descendant, depth)
+        WITH RECURSIVE closure AS (
+            SELECT id AS ancestor, id AS descendant, 0 AS depth
+            FROM employees
+            UNION ALL
+            SELECT c.ancestor, e.id, c.depth + 1
+            FROM closure c
+            JOIN employees e ON e.manager_id = c.descendant
+            WHERE c.depth < %s
+        )
+        SELECT ancestor, descendant, depth FROM closure
+    """, (max_depth,))
+    rows = cursor.rowcount
+    cursor.execute("ALTER TABLE employee_closure ADD PRIMARY KEY (ancestor, descendant)")
+    cursor.execute("CREATE INDEX employee_closure_descendant_idx ON employee_closure (descendant, depth)")
+    cursor.execute("ANALYZE employee_closure")
+    return rows
+
+
+CLOSURE_SELF_SQL = """
+    INSERT INTO employee_closure (ancestor, descendant, depth)
+    VALUES (%s, %s, 0)
+"""
+
+CLOSURE_ANCESTORS_SQL = """
+    INSERT INTO employee_closure (ancestor, descendant, depth)
+    SELECT ancestor, %s, depth + 1
+    FROM employee_closure
+    WHERE descendant = %s
+"""
+
+
+def add_to_closure(cursor, employee_id, manager_id):
+    """Добавляет строки нового сотрудника: связь с собой и со всеми руководителями"""
+    cursor.execute(CLOSURE_SELF_SQL, (employee_id, employee_id))
+    if manager_id is not None:
+        cursor.execute(CLOSURE_ANCESTORS_SQL, (employee_id, manager_id))
+
+
+def add_many_to_closure(cursor, employees):
+    """add_to_closure() для списка пар (id, manager_id) двумя запросами
+
+    Руководители должны уже быть в таблице замыкания.
+    """
+    ids = [employee_id for employee_id, _ in employees]
+    manager_ids = [manager_id for _, manager_id in employees]
+    cursor.execute("""
+        INSERT INTO employee_closure (ancestor, descendant, depth)
+        SELECT id, id, 0 FROM unnest(%s::int[]) AS n(id)
+    """, (ids,))
+    cursor.execute("""
+        INSERT INTO employee_closure (ancestor, descendant, depth)
+        SELECT c.ancestor, n.id, c.depth + 1
+        FROM unnest(%s::int[], %s::int[]) AS n(id, manager_id)
+        JOIN employee_closure c ON c.descendant = n.manager_id
+    """, (ids, manager_ids))
+
+
+def is_subordinate(cursor, employee_id, manager_id):
+    """Подчинен ли employee_id (на любой глубине) руководителю manager_id"""
+    cursor.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM employee_closure
+            WHERE ancestor = %s AND descendant = %s AND depth > 0
+        )
+    """, (manager_id, employee_id))
+    return cursor.fetchone()[0]
+
+
+def get_reports(cursor, manager_id, max_depth=None):
+    """id всех подчиненных руководителя с глубиной, по таблице замыкания"""
+    sql = """
+        SELECT descendant, depth
+        FROM employee_closure
+        WHERE ancestor = %s AND depth > 0
+    """
+    params = [manager_id]
+    if max_depth is not None:
+        sql += " AND depth <= %s"
+        params.append(max_depth)
+    cursor.execute(sql + " ORDER BY depth, descendant", params)
+    return cursor.fetchall()
+
+
+def count_reports(cursor, manager_id):
+    """Число всех подчиненных руководителя по таблице замыкания"""
+    cursor.execute("""
+        SELECT COUNT(*) FROM employee_closure WHERE ancestor = %s AND depth > 0
+    """, (manager_id,))
+    return cursor.fetchone()[0]
+
+
+def get_depth(cursor, employee_id):
+    """Глубина сотрудника от вершины иерархии (CEO - 0), None если не найден"""
+    cursor.execute("""
+        SELECT MAX(depth) FROM employee_closure WHERE descendant = %s
+    """, (employee_id,))
+    return cursor.fetchone()[0]
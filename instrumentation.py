@@ -0,0 +1,405 @@
+"""Учет SQL-запросов: время, строки, объем, планы медленных запросов
+
+InstrumentedCursor - cursor_factory для соединений пула (db_pool), так
+что учитывается каждый execute/executemany/copy_expert без изменений в
+вызывающем коде, включая именованные курсоры iter_employees.
+
+По каждому запросу запоминаются форма (текст SQL без литералов: %s
+остаются, константы и списки VALUES свернуты), параметры, длительность,
+число строк и примерный объем прочитанных данных (по образцу строк каждой
+порции). Дальше:
+
+- query_stats() / print_query_stats() - сводка по формам в процессе;
+- SQL_LOG_FILE - журнал JSON, одна строка на запрос;
+  load_log() собирает из него ту же сводку (python main.py sql-stats);
+- write_prometheus() - текстовый формат Prometheus в файл;
+- SQL_EXPLAIN_THRESHOLD_MS > 0 - для чтений дольше порога сохраняется
+  EXPLAIN (ANALYZE, BUFFERS); запрос при этом выполняется повторно.
+
+Настройки (см. config.py): SQL_STATS, SQL_LOG_FILE, SQL_EXPLAIN_THRESHOLD_MS.
+"""
+import functools
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import psycopg2.extensions
+
+import config
+
+# Сколько последних длительностей хранить на форму для перцентилей
+SAMPLE_SIZE = 1000
+PARAMS_REPR_LIMIT = 200
+# Длиннее - список VALUES сворачивается до первой строки еще до разбора
+SHAPE_SQL_LIMIT = 4096
+# По скольким строкам порции оценивается её объем
+BYTES_SAMPLE = 20
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_VALUES_LIST = re.compile(r"(\([^()]*\))(?:\s*,\s*\([^()]*\))+")
+_VALUES_START = re.compile(r"\bVALUES\s*\(", re.IGNORECASE)
+_ARRAY = re.compile(r"ARRAY\[[^\[\]]*\]")
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|EXECUTE)\b", re.IGNORECASE)
+_WRITES = re.compile(r"\b(INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+
+_lock = threading.Lock()
+_shapes = {}
+_slow_plans = deque(maxlen=20)
+_log_file = None
+
+
+def _collapse_values(sql):
+    """Оставляет от длинного списка VALUES первую строку и хвост запроса
+
+    execute_values подставляет все строки пакета в текст SQL (десятки КБ на
+    пакет) - разбирать и кэшировать такой текст целиком дорого. Хвост -
+    текст после последней скобки (RETURNING ...).
+    """
+    match = _VALUES_START.search(sql)
+    first_end = sql.find("),", match.end()) if match else -1
+    tail_start = sql.rfind(")") + 1
+    if first_end == -1 or first_end + 1 >= tail_start:
+        return sql[:SHAPE_SQL_LIMIT]
+    return sql[:first_end + 1] + ", (...)" + sql[tail_start:]
+
+
+def query_shape(sql):
+    """Форма запроса: пробелы схлопнуты, литералы - ?, списки VALUES и ARRAY свернуты"""
+    if isinstance(sql, bytes):
+        sql = sql.decode(errors="replace")
+    sql = str(sql)
+    if len(sql) > SHAPE_SQL_LIMIT:
+        sql = _collapse_values(sql)
+    return _shape(sql)
+
+
+@functools.lru_cache(maxsize=1024)
+def _shape(sql):
+    shape = " ".join(sql.split())
+    shape = _LITERAL.sub("?", shape)
+    shape = _ARRAY.sub("ARRAY[...]", shape)
+    return _VALUES_LIST.sub(r"\1, ...", shape)
+
+
+def shape_id(shape):
+    return hashlib.md5(shape.encode()).hexdigest()[:12]
+
+
+def _row_bytes(row):
+    """Примерный объем строки: длина текста/байтов, 8 байт на прочие значения"""
+    size = 0
+    for value in row:
+        if isinstance(value, (str, bytes)):
+            size += len(value)
+        elif value is not None:
+            size += 8
+    return size
+
+
+def _rows_bytes(rows):
+    """Примерный объем порции строк по первым BYTES_SAMPLE строкам"""
+    if len(rows) <= BYTES_SAMPLE:
+        return sum(_row_bytes(row) for row in rows)
+    sample = sum(_row_bytes(row) for row in rows[:BYTES_SAMPLE])
+    return sample * len(rows) // BYTES_SAMPLE
+
+
+def _params_repr(params):
+    if params is None:
+        return None
+    text = repr(params)
+    return text if len(text) <= PARAMS_REPR_LIMIT else text[:PARAMS_REPR_LIMIT] + "..."
+
+
+class _ShapeStats:
+    def __init__(self, shape):
+        self.shape = shape
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.durations = deque(maxlen=SAMPLE_SIZE)
+
+    def add(self, duration, rows, nbytes, error=False):
+        self.calls += 1
+        self.errors += int(error)
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.rows += rows
+        self.bytes += nbytes
+        self.durations.append(duration)
+
+    def summary(self):
+        durations = sorted(self.durations)
+
+        def pct(q):
+            return durations[min(len(durations) - 1, int(q * len(durations)))] if durations else 0.0
+
+        return {
+            "shape_id": shape_id(self.shape),
+            "shape": self.shape,
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_s": self.total,
+            "mean_ms": self.total / self.calls * 1000 if self.calls else 0.0,
+            "p50_ms": pct(0.5) * 1000,
+            "p99_ms": pct(0.99) * 1000,
+            "max_ms": self.max * 1000,
+            "rows": self.rows,
+            "bytes": self.bytes,
+        }
+
+
+def _write_log(entry):
+    global _log_file
+    if not config.SQL_LOG_FILE:
+        return
+    line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+    with _lock:
+        if _log_file is None:
+            _log_file = open(config.SQL_LOG_FILE, "a", encoding="utf-8", buffering=1)
+        _log_file.write(line)
+
+
+def record(sql, params, duration, rows=0, nbytes=0, error=None):
+    """Добавляет выполненный запрос в сводку и журнал"""
+    shape = query_shape(sql)
+    with _lock:
+        stats = _shapes.get(shape)
+        if stats is None:
+            stats = _shapes[shape] = _ShapeStats(shape)
+        stats.add(duration, rows, nbytes, error is not None)
+    _write_log({
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "event": "query",
+        "shape_id": shape_id(shape),
+        "shape": shape,
+        "params": _params_repr(params),
+        "duration_ms": round(duration * 1000, 3),
+        "rows": rows,
+        "bytes": nbytes,
+        "error": error,
+    })
+
+
+def _explain(conn, sql, params, duration):
+    """Сохраняет EXPLAIN (ANALYZE, BUFFERS) для медленного чтения"""
+    if isinstance(sql, bytes):
+        sql = sql.decode(errors="replace")
+    if not _EXPLAINABLE.match(sql) or _WRITES.search(sql):
+        return
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cursor:
+            cursor.execute("SAVEPOINT explain_slow_query")
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, params)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+            cursor.execute("RELEASE SAVEPOINT explain_slow_query")
+    except psycopg2.Error as e:
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cursor:
+                cursor.execute("ROLLBACK TO SAVEPOINT explain_slow_query")
+        except psycopg2.Error:
+            pass
+        plan = f"EXPLAIN не выполнен: {e}"
+
+    shape = query_shape(sql)
+    entry = {
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "event": "explain",
+        "shape_id": shape_id(shape),
+        "shape": shape,
+        "params": _params_repr(params),
+        "duration_ms": round(duration * 1000, 3),
+        "plan": plan,
+    }
+    with _lock:
+        _slow_plans.append(entry)
+    _write_log(entry)
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """Курсор, учитывающий каждый запрос (см. модуль)
+
+    Строки и объем накапливаются при чтении и записываются, когда
+    результат дочитан, при следующем запросе или закрытии курсора.
+    """
+
+    _pending = None
+
+    def _start(self, sql, params):
+        self._finish()
+        self._pending = [sql, params, 0.0, 0, 0, None]
+
+    def _finish(self):
+        pending = self._pending
+        if pending is None:
+            return
+        self._pending = None
+        sql, params, duration, rows, nbytes, error = pending
+        if rows == 0 and self.description is None and self.rowcount > 0:
+            rows = self.rowcount
+        record(sql, params, duration, rows, nbytes, error)
+
+    def _timed(self, method, sql, params, *args):
+        self._start(sql, params)
+        pending = self._pending
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        except psycopg2.Error as e:
+            pending[5] = type(e).__name__
+            raise
+        finally:
+            pending[2] = time.perf_counter() - started
+            if (pending[5] is None and config.SQL_EXPLAIN_THRESHOLD_MS > 0
+                    and pending[2] * 1000 >= config.SQL_EXPLAIN_THRESHOLD_MS):
+                _explain(self.connection, sql, params, pending[2])
+            # Именованный курсор читает результат при fetch - ждем его
+            if pending[5] is not None or (self.description is None and not self.name):
+                self._finish()
+
+    def execute(self, query, vars=None):
+        return self._timed(super().execute, query, vars, query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._timed(super().executemany, query, None, query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._timed(super().copy_expert, sql, None, sql, file, size)
+
+    def _fetched(self, rows, started, exhausted):
+        pending = self._pending
+        if pending is not None:
+            # Для именованного курсора основное время - FETCH
+            pending[2] += time.perf_counter() - started
+            pending[3] += len(rows)
+            pending[4] += _rows_bytes(rows)
+            if exhausted:
+                self._finish()
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched([row] if row is not None else [], started, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(rows, started, not rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(rows, started, True)
+        return rows
+
+    def __iter__(self):
+        size = self.itersize if self.name else 1000
+        while True:
+            rows = self.fetchmany(size)
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+def query_stats(order_by="total_s"):
+    """Сводка по формам запросов этого процесса, по убыванию order_by"""
+    with _lock:
+        summaries = [stats.summary() for stats in _shapes.values()]
+    return sorted(summaries, key=lambda s: s[order_by], reverse=True)
+
+
+def slow_plans():
+    with _lock:
+        return list(_slow_plans)
+
+
+def reset_stats():
+    with _lock:
+        _shapes.clear()
+        _slow_plans.clear()
+
+
+def load_log(path):
+    """Сводка по формам из журнала SQL_LOG_FILE (для других процессов)
+
+    Возвращает (сводка как у query_stats(), планы медленных запросов).
+    """
+    shapes = {}
+    plans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("event") == "explain":
+                plans.append(entry)
+                continue
+            stats = shapes.get(entry["shape"])
+            if stats is None:
+                stats = shapes[entry["shape"]] = _ShapeStats(entry["shape"])
+            stats.add(entry["duration_ms"] / 1000, entry.get("rows", 0), entry.get("bytes", 0),
+                      bool(entry.get("error")))
+    summaries = sorted((stats.summary() for stats in shapes.values()),
+                       key=lambda s: s["total_s"], reverse=True)
+    return summaries, plans
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def prometheus_text(summaries):
+    """Сводка в текстовом формате Prometheus"""
+    metrics = (
+        ("sql_queries_total", "counter", "Выполнено запросов", "calls"),
+        ("sql_query_errors_total", "counter", "Запросов с ошибкой", "errors"),
+        ("sql_query_duration_seconds_total", "counter", "Суммарное время запросов", "total_s"),
+        ("sql_query_duration_seconds_max", "gauge", "Максимальное время запроса", "max_ms"),
+        ("sql_rows_total", "counter", "Прочитано или изменено строк", "rows"),
+        ("sql_fetched_bytes_total", "counter", "Примерный объем прочитанных данных", "bytes"),
+    )
+    lines = []
+    for name, kind, help_text, key in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for s in summaries:
+            value = s[key] / 1000 if key == "max_ms" else s[key]
+            lines.append(f'{name}{{shape_id="{s["shape_id"]}",query="{_label(s["shape"][:120])}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, summaries=None):
+    """Записывает сводку (по умолчанию - этого процесса) в файл для node_exporter/textfile"""
+    text = prometheus_text(query_stats() if summaries is None else summaries)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def print_query_stats(summaries=None, limit=15):
+    from tabulate import tabulate
+
+    summaries = query_stats() if summaries is None else summaries
+    print(f"\nSQL-запросы (форм: {len(summaries)}, по суммарному времени):")
+    if not summaries:
+        return
+    print(tabulate(
+        [(s["shape_id"], s["shape"][:70], s["calls"], f"{s['total_s'] * 1000:.0f}",
+          f"{s['p50_ms']:.2f}", f"{s['p99_ms']:.2f}", f"{s['max_ms']:.2f}", s["rows"], s["bytes"])
+         for s in summaries[:limit]],
+        headers=["ID", "Запрос", "Вызовов", "Всего, мс", "p50, мс", "p99, мс", "Макс, мс",
+                 "Строк", "Байт"],
+        tablefmt="grid"
+    ))
@@ -0,0 +1,131 @@
+"""Пулы имен для генерации тестовых данных
+
+Уникальные имена, фамилии и отчества один раз выбираются из Mimesis и
+сохраняются на диск в компактном виде. При следующих запусках файлы
+отображаются в память (mmap), а имя сотрудника - это просто индекс в пуле.
+
+Формат файла пула:
+    MAGIC | count (uint32) | offsets ((count + 1) x uint32) | UTF-8 данные
+Числа записаны в порядке байт текущей платформы.
+"""
+import mmap
+import os
+import struct
+from array import array
+from collections import namedtuple
+from functools import lru_cache
+
+from mimesis import Person
+
+MAGIC = b"NAMEPOOL"
+HEADER = struct.Struct("=8sI")
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".name_pools")
+DEFAULT_POOL_SIZE = 5000
+DEFAULT_POOL_SEED = 0
+
+NamePools = namedtuple("NamePools", ["first", "last", "middle"])
+
+
+class NamePool:
+    """Пул строк, отображенный в память; поддерживает len() и индексацию"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = HEADER.unpack_from(self._mm)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: не является файлом пула имен")
+
+        self._count = count
+        offsets_end = HEADER.size + (count + 1) * 4
+        self._offsets = memoryview(self._mm)[HEADER.size:offsets_end].cast("I")
+        self._data_start = offsets_end
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("индекс вне пула имен")
+        start = self._data_start + self._offsets[index]
+        end = self._data_start + self._offsets[index + 1]
+        return self._mm[start:end].decode("utf-8")
+
+
+def write_pool(path, names):
+    """Сохраняет список строк в файл пула"""
+    encoded = [name.encode("utf-8") for name in names]
+    offsets = array("I", [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(encoded)))
+        f.write(offsets.tobytes())
+        for value in encoded:
+            f.write(value)
+    os.replace(tmp_path, path)
+
+
+def _draw_unique(draw, size, max_attempts):
+    """Вызывает draw() до size уникальных значений или max_attempts попыток"""
+    names = {}
+    for _ in range(max_attempts):
+        names.setdefault(draw(), None)
+        if len(names) >= size:
+            break
+    return list(names)
+
+
+def build_name_pools(locale="ru", seed=DEFAULT_POOL_SEED, size=DEFAULT_POOL_SIZE):
+    """Выбирает уникальные имена из Mimesis
+
+    В словарях Mimesis может оказаться меньше size уникальных значений -
+    тогда пул содержит все, что удалось найти за size * 20 попыток.
+    """
+    person = Person(locale, seed=seed)
+    max_attempts = size * 20
+
+    if locale == "ru":
+        from mimesis.builtins import RussiaSpecProvider
+        draw_middle = RussiaSpecProvider(seed=seed).patronymic
+    else:
+        draw_middle = person.last_name
+
+    return NamePools(
+        first=_draw_unique(person.first_name, size, max_attempts),
+        last=_draw_unique(person.last_name, size, max_attempts),
+        middle=_draw_unique(draw_middle, size, max_attempts),
+    )
+
+
+def pool_path(kind, locale, seed, size):
+    return os.path.join(CACHE_DIR, f"{kind}_{locale}_{seed}_{size}.pool")
+
+
+@lru_cache(maxsize=None)
+def load_name_pools(locale="ru", seed=None, size=DEFAULT_POOL_SIZE):
+    """Возвращает пулы имен, при первом обращении создавая файлы на диске"""
+    if seed is None:
+        seed = DEFAULT_POOL_SEED
+
+    paths = {kind: pool_path(kind, locale, seed, size) for kind in NamePools._fields}
+    if not all(os.path.exists(path) for path in paths.values()):
+        print(f"👉 Создаем пулы имен ({locale}, seed={seed}, size={size})...")
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        pools = build_name_pools(locale, seed, size)
+        for kind, names in zip(NamePools._fields, pools):
+            write_pool(paths[kind], names)
+
+    return NamePools(**{kind: NamePool(path) for kind, path in paths.items()})
+
+
+if __name__ == "__main__":
+    for kind, pool in zip(NamePools._fields, load_name_pools()):
+        print(f"{kind}: {len(pool)} значений, например {pool[0]}")
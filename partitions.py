@@ -0,0 +1,118 @@
+"""Секционирование таблицы employees
+
+Для организаций на миллионы сотрудников таблицу employees можно создать
+секционированной (декларативное секционирование PostgreSQL 11+):
+
+- "position"  - LIST по position_id, секция employees_p<id> на должность:
+  фильтры по должности и уровню (e.position_id = ANY(...)) читают только
+  секции своих должностей;
+- "hire_date" - RANGE по hire_date, секция employees_y<год> на год приема:
+  сортировка по дате приема идет по секциям по порядку, а следующая
+  keyset-страница не читает секции до даты ключа.
+
+Значения вне секций (новые должности, даты за пределами лет) попадают в
+employees_default.
+
+Ограничения секционированной таблицы: первичный ключ должен включать ключ
+секционирования - (id, position_id) или (id, hire_date), поэтому внешний
+ключ manager_id -> employees(id) невозможен. id по-прежнему выдает одна
+последовательность, руководителя проверяет validate_employee.
+
+    python main.py generate --rows 5000000 --workers 16 --partition position
+"""
+from datetime import date
+
+# Схема -> (метод секционирования, ключ)
+PARTITION_SCHEMES = {
+    "position": ("LIST", "position_id"),
+    "hire_date": ("RANGE", "hire_date"),
+}
+DEFAULT_PARTITION = "employees_default"
+# Первый год приема в тестовых данных (CEO - 2010)
+FIRST_HIRE_YEAR = 2010
+
+# Индекс секции ключа в строке EMPLOYEE_COLUMNS
+_KEY_INDEX = {"position": 3, "hire_date": 4}
+
+
+def hire_years():
+    """Годы секций по дате приема: с FIRST_HIRE_YEAR по следующий год"""
+    return range(FIRST_HIRE_YEAR, date.today().year + 2)
+
+
+def partition_name(scheme, key):
+    """Секция для значения ключа: id должности или даты приема"""
+    if scheme == "position":
+        return f"employees_p{key}"
+    return f"employees_y{key.year}"
+
+
+def create_partitions(cursor, scheme):
+    """Создает секции employees и секцию по умолчанию
+
+    Для схемы "position" - по секции на каждую строку positions.
+    Возвращает имена созданных секций.
+    """
+    names = []
+    if scheme == "position":
+        cursor.execute("SELECT id FROM positions ORDER BY id")
+        for (position_id,) in cursor.fetchall():
+            name = partition_name(scheme, position_id)
+            cursor.execute(f"CREATE TABLE {name} PARTITION OF employees FOR VALUES IN ({int(position_id)})")
+            names.append(name)
+    else:
+        for year in hire_years():
+            name = f"employees_y{year}"
+            cursor.execute(f"""
+                CREATE TABLE {name} PARTITION OF employees
+                FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')
+            """)
+            names.append(name)
+    cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF employees DEFAULT")
+    names.append(DEFAULT_PARTITION)
+    return names
+
+
+def partition_scheme(cursor):
+    """Схема секционирования employees по каталогу или None"""
+    cursor.execute("""
+        SELECT a.attname
+        FROM pg_partitioned_table pt
+        JOIN pg_attribute a ON a.attrelid = pt.partrelid AND a.attnum = pt.partattrs[0]
+        WHERE pt.partrelid = to_regclass('employees')
+    """)
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    for scheme, (method, column) in PARTITION_SCHEMES.items():
+        if column == row[0]:
+            return scheme
+    return None
+
+
+def employee_partitions(cursor):
+    """Имена секций employees (пустой список для обычной таблицы)"""
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass('employees')
+        ORDER BY c.relname
+    """)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def route_rows(scheme, rows, partitions):
+    """Раскладывает строки EMPLOYEE_COLUMNS по секциям: {секция: [строки]}
+
+    Строки, для которых нет секции из partitions, идут в секцию по умолчанию.
+    """
+    partitions = set(partitions)
+    key_index = _KEY_INDEX[scheme]
+    routed = {}
+    for row in rows:
+        name = partition_name(scheme, row[key_index])
+        if name not in partitions:
+            name = DEFAULT_PARTITION
+        routed.setdefault(name, []).append(row)
+    return routed
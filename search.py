@@ -0,0 +1,133 @@
+"""Поиск сотрудников по ФИО (pg_trgm)
+
+Фамилия, имя и отчество склеиваются в одно выражение (NAME_EXPR) в нижнем
+регистре и с заменой "ё" на "е"; по нему строится GIN-индекс
+gin_trgm_ops. Индекс обслуживает оба вида совпадений:
+
+- подстрока/префикс - каждое слово запроса входит в ФИО (LIKE '%слово%'),
+  так работает ввод с подсказками: "петр ив";
+- нечеткое - запрос похож на слово ФИО (оператор <%, word_similarity),
+  так находятся опечатки: "петрв".
+
+Выше в результатах - совпадения с начала ФИО, затем по word_similarity.
+Страницы - keyset по (ранг, id).
+
+Ранжируются не все совпадения, а ограниченный набор кандидатов: короткий
+частый запрос ("ива") совпадает с десятками тысяч строк. Кандидаты - до
+SEARCH_CANDIDATES совпадений с начала ФИО по B-дереву в порядке ФИО
+(SEARCH_PREFIX_INDEX, COLLATE "C" - индекс дает и LIKE 'префикс%', и
+порядок) и до SEARCH_CANDIDATES совпадений из GIN-индекса. Страницы дальше
+кандидатов не выдаются - запрос нужно уточнить.
+
+pg_trgm выделяет триграммы только из букв по LC_CTYPE базы: в базе с
+локалью C кириллица не индексируется. check_trigrams() это проверяет.
+"""
+from employees import PAGE_SIZE
+
+# {t} - префикс таблицы: "" в индексе, "e." в запросах
+NAME_EXPR = ("translate(lower({t}last_name || ' ' || {t}first_name || ' ' "
+             "|| COALESCE({t}middle_name, '')), 'ё', 'е')")
+SEARCH_INDEX = "employees_name_trgm_idx"
+SEARCH_PREFIX_INDEX = "employees_name_prefix_idx"
+# Сколько совпадений каждого вида ранжируется (см. модуль)
+SEARCH_CANDIDATES = 1000
+# Короче трех символов триграмм нет, и индекс не помогает
+MIN_QUERY_LENGTH = 3
+
+
+def normalize_query(query):
+    """Запрос в виде NAME_EXPR: нижний регистр, ё -> е, одиночные пробелы"""
+    query = " ".join((query or "").lower().replace("ё", "е").split())
+    if len(query) < MIN_QUERY_LENGTH:
+        raise ValueError(f"запрос должен быть не короче {MIN_QUERY_LENGTH} символов")
+    return query
+
+
+def _like_escape(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def check_trigrams(cursor):
+    """Выделяет ли pg_trgm триграммы из кириллицы в этой базе"""
+    cursor.execute("SELECT array_length(show_trgm('иван'), 1) > 0")
+    return bool(cursor.fetchone()[0])
+
+
+def create_search_index(cursor):
+    """Создает расширение pg_trgm, GIN-индекс и индекс префиксов по ФИО
+
+    Возвращает False, если триграммы не выделяются из кириллицы.
+    """
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    cursor.execute(f"DROP INDEX IF EXISTS {SEARCH_INDEX}")
+    cursor.execute(f"CREATE INDEX {SEARCH_INDEX} ON employees "
+                   f"USING gin (({NAME_EXPR.format(t='')}) gin_trgm_ops)")
+    cursor.execute(f"DROP INDEX IF EXISTS {SEARCH_PREFIX_INDEX}")
+    cursor.execute(f"CREATE INDEX {SEARCH_PREFIX_INDEX} ON employees "
+                   f"(({NAME_EXPR.format(t='')}) COLLATE \"C\")")
+    return check_trigrams(cursor)
+
+
+def search_employees(cursor, query, limit=PAGE_SIZE, after=None):
+    """Сотрудники, чьи ФИО совпадают с запросом, по убыванию ранга
+
+    Строки - столбцы EMPLOYEES_SELECT и ранг последним столбцом.
+    after - search_key() последней строки предыдущей страницы.
+    ValueError, если запрос короче MIN_QUERY_LENGTH.
+    """
+    query = normalize_query(query)
+    words = query.split()
+    name = NAME_EXPR.format(t="e.")
+
+    prefix = _like_escape(query) + "%"
+    rank = f"(word_similarity(%s, {name}) + CASE WHEN {name} LIKE %s THEN 1 ELSE 0 END)::float8"
+    match = " AND ".join([f"{name} LIKE %s"] * len(words))
+    match_params = ["%" + _like_escape(word) + "%" for word in words]
+
+    params = [prefix, SEARCH_CANDIDATES] + match_params + [query, SEARCH_CANDIDATES, query, prefix]
+    keyset = ""
+    if after is not None:
+        keyset = "WHERE rank < %s OR (rank = %s AND id > %s)"
+        params.extend([after[0], after[0], after[1]])
+    params.append(limit)
+
+    sql = f"""
+        WITH candidates AS (
+            (SELECT e.id
+             FROM employees e
+             WHERE {name} COLLATE "C" LIKE %s
+             ORDER BY {name} COLLATE "C"
+             LIMIT %s)
+            UNION
+            (SELECT e.id
+             FROM employees e
+             WHERE ({match}) OR %s <%% {name}
+             LIMIT %s)
+        ),
+        found AS (
+            SELECT id, rank
+            FROM (
+                SELECT e.id, {rank} AS rank
+                FROM candidates c
+                JOIN employees e ON e.id = c.id
+            ) ranked
+            {keyset}
+            ORDER BY rank DESC, id
+            LIMIT %s
+        )
+        SELECT e.id, e.first_name, e.last_name, e.middle_name,
+               p.title, p.level, e.hire_date, e.salary,
+               m.first_name || ' ' || m.last_name, f.rank
+        FROM found f
+        JOIN employees e ON e.id = f.id
+        LEFT JOIN positions p ON e.position_id = p.id
+        LEFT JOIN employees m ON e.manager_id = m.id
+        ORDER BY f.rank DESC, e.id
+    """
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+
+def search_key(row):
+    """Ключ keyset-пагинации строки результата: (ранг, id)"""
+    return row[-1], row[0]
@@ -0,0 +1,138 @@
+"""Потоковый вывод таблиц в консоль
+
+tabulate вычисляет ширину столбцов по всем строкам, поэтому весь
+результат должен быть в памяти до вывода первой строки. Здесь ширина
+определяется заранее - по первым sample_size строкам или по схеме
+результата (VARCHAR(100), INTEGER, DATE...), - а строки печатаются по
+мере чтения из генератора (например, employees.iter_employees поверх
+серверного курсора). Длинные значения обрезаются до ширины столбца.
+Формат рамок - как у tabulate(tablefmt="grid").
+
+    stream_table(iter_employees(conn, [], []), EMPLOYEE_HEADERS)
+"""
+import itertools
+import sys
+from decimal import Decimal
+
+SAMPLE_SIZE = 100
+MAX_WIDTH = 30
+
+# Ширина значений по типу столбца PostgreSQL (oid типа)
+TYPE_WIDTHS = {
+    21: 6,      # smallint
+    23: 11,     # integer
+    20: 20,     # bigint
+    700: 12,    # real
+    701: 16,    # double precision
+    1700: 16,   # numeric
+    1082: 10,   # date
+    1114: 26,   # timestamp
+    1184: 32,   # timestamptz
+    16: 5,      # boolean
+}
+VARCHAR_OID = 1043
+BPCHAR_OID = 1042
+
+
+def _cell(value):
+    return "" if value is None else str(value)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+
+def sample_widths(headers, rows, max_width=MAX_WIDTH):
+    """Ширины столбцов по заголовкам и образцу строк"""
+    widths = [len(str(header)) for header in headers]
+    for row in rows:
+        for i, value in enumerate(row):
+            widths[i] = max(widths[i], len(_cell(value)))
+    return [min(width, max_width) for width in widths]
+
+
+def query_widths(cursor, sql, params, headers, max_width=MAX_WIDTH):
+    """Ширины столбцов по схеме результата запроса, без чтения строк
+
+    Запрос выполняется с LIMIT 0 ради описания столбцов; для столбцов
+    таблиц длина VARCHAR(n) берется из pg_attribute.
+    """
+    cursor.execute(f"SELECT * FROM ({sql}) AS q LIMIT 0", params)
+    columns = cursor.description
+
+    lengths = {}
+    origins = [(c.table_oid, c.table_column) for c in columns if c.table_oid]
+    if origins:
+        cursor.execute("""
+            SELECT attrelid, attnum, atttypmod
+            FROM pg_attribute
+            WHERE (attrelid, attnum) IN (SELECT * FROM unnest(%s::oid[], %s::int2[]))
+        """, ([oid for oid, _ in origins], [num for _, num in origins]))
+        lengths = {(oid, num): typmod - 4 for oid, num, typmod in cursor.fetchall() if typmod > 4}
+
+    widths = []
+    for header, column in zip(headers, columns):
+        if column.type_code in (VARCHAR_OID, BPCHAR_OID):
+            width = lengths.get((column.table_oid, column.table_column), max_width)
+        else:
+            width = TYPE_WIDTHS.get(column.type_code, max_width)
+        widths.append(min(max(width, len(str(header))), max_width))
+    return widths
+
+
+class StreamingTable:
+    """Таблица с заранее известной шириной столбцов, строки печатаются сразу"""
+
+    def __init__(self, headers, widths, out=None):
+        self.headers = [str(header) for header in headers]
+        self.widths = widths
+        self.out = out or sys.stdout
+        self.rows = 0
+
+    def _border(self, char="-"):
+        return "+" + "+".join(char * (width + 2) for width in self.widths) + "+"
+
+    def _line(self, values, numeric=()):
+        cells = []
+        for i, (value, width) in enumerate(zip(values, self.widths)):
+            if len(value) > width:
+                value = value[:width - 1] + "…"
+            cells.append(value.rjust(width) if i in numeric else value.ljust(width))
+        return "| " + " | ".join(cells) + " |"
+
+    def header(self):
+        self.out.write(self._border() + "\n")
+        self.out.write(self._line(self.headers) + "\n")
+        self.out.write(self._border("=") + "\n")
+
+    def row(self, row):
+        if self.rows:
+            self.out.write(self._border() + "\n")
+        numeric = {i for i, value in enumerate(row) if _is_number(value)}
+        self.out.write(self._line([_cell(value) for value in row], numeric) + "\n")
+        self.rows += 1
+
+    def footer(self):
+        self.out.write(self._border() + "\n")
+        self.out.flush()
+
+
+def stream_table(rows, headers, widths=None, sample_size=SAMPLE_SIZE, max_width=MAX_WIDTH,
+                 out=None):
+    """Печатает строки из итератора по мере поступления
+
+    Без widths ширины считаются по первым sample_size строкам: в памяти
+    держится только этот образец. Возвращает число выведенных строк.
+    """
+    rows = iter(rows)
+    sample = []
+    if widths is None:
+        sample = list(itertools.islice(rows, sample_size))
+        widths = sample_widths(headers, sample, max_width)
+
+    table = StreamingTable(headers, widths, out)
+    table.header()
+    for row in itertools.chain(sample, rows):
+        table.row(row)
+    table.footer()
+    return table.rows